@@ -5,13 +5,35 @@ from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session, select
+from sqlalchemy import event, inspect
+from cache import TTLCache
+from concurrent.futures import ThreadPoolExecutor
 import database, models
+import asyncio
+import os
+import threading
+import time
 SECRET_KEY = "your_secret_key"  # in production, load from env
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 # --- Password Hasher ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
+
+# min/max pin the cost, so hashes made with any other cost report needs_update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a small dedicated pool keeps hashing off the request threadpool
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -19,6 +41,29 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_hasher(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Too many logins in progress, try again shortly", headers={"Retry-After": "1"})
+    try:
+        return await asyncio.wrap_future(_hash_executor.submit(fn, *args))
+    finally:
+        _hash_slots.release()
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hasher(pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    # Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated cost
+    return await _run_hasher(pwd_context.verify_and_update, plain_password, hashed_password)
+
+# --- Cached Lookups ---
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+_token_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)  # token -> verified claims
+_user_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)  # token subject -> user columns
+
+
 # --- Token Handling ---
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -27,21 +72,58 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_access_token(token: str):
+    payload = _token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         return None
+    # Never keep a token around past its own expiry
+    _token_cache.set(token, payload, ttl=payload.get("exp", 0) - time.time())
+    return payload
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
+def invalidate_user(username: str) -> None:
+    _user_cache.pop(username)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.username)
+    # A rename leaves the entry under the old subject behind
+    history = inspect(target).attrs.username.history
+    for username in history.deleted or ():
+        invalidate_user(username)
+
+
+def cache_stats() -> dict:
+    return {"tokens": _token_cache.stats(), "users": _user_cache.stats()}
+
+
 def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(database.get_session)):
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
     username = payload.get("sub")
-    user = session.exec(select(models.User).where(models.User.username == username)).first()
+    user_id = payload.get("uid")
+    cached = _user_cache.get(username)
+    # The id must match too: a token for a deleted account must not resolve to
+    # whoever registered the same username afterwards
+    if cached is not None and (user_id is None or cached["id"] == user_id):
+        return models.User(**cached)
+
+    if user_id is not None:
+        # Primary key lookup; tokens issued before "uid" was added fall back to the username
+        user = session.get(models.User, user_id)
+        if user and user.username != username:
+            user = None
+    else:
+        user = session.exec(select(models.User).where(models.User.username == username)).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
+
+    _user_cache.set(username, user.model_dump())
     return user
-   
\ No newline at end of file
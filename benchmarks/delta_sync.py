@@ -0,0 +1,69 @@
+# benchmarks/delta_sync.py
+# Against a throwaway API: creates an invoice with items, takes the list's
+# ETag and X-Next-Since, deletes the invoice and checks that the old ETag no
+# longer answers 304 and that the ?since= delta reports the invoice as deleted.
+# Exits 1 on the first check that fails.
+#
+#   python benchmarks/delta_sync.py
+import json
+import sys
+import urllib.parse
+from datetime import datetime, timedelta
+
+from harness import Client, api_server
+
+PASSWORD = "benchmark-password"
+
+
+def check(label: str, ok: bool, detail: str = "") -> bool:
+    print(f"  {'ok' if ok else 'FAILED':<7}{label}{f' ({detail})' if detail and not ok else ''}")
+    return ok
+
+
+def run(client: Client) -> bool:
+    client.json("POST", "/users/register", body={"username": "sync", "email": "sync@example.com", "password": PASSWORD})
+    token = client.json("POST", "/users/login", form={"username": "sync", "password": PASSWORD})["access_token"]
+    invoice = client.json("POST", "/invoices/", token=token, body={
+        "client_name": "Acme Corp", "client_email": "billing@acme.test",
+        "due_date": (datetime.now() + timedelta(days=30)).isoformat(), "billing_address": "1 Market Street",
+        "items": [{"title": f"Item {j}", "quantity": 1, "unit_price": "10.00"} for j in range(3)],
+    })
+    invoice_id = invoice["id"]
+
+    status, headers, _ = client.request_with_headers("GET", "/invoices/", token=token)
+    etag, since = headers.get("etag"), headers.get("x-next-since")
+    if not check("GET /invoices/ sends ETag and X-Next-Since", status == 200 and bool(etag) and bool(since), f"{status} {headers}"):
+        return False
+    status, _, _ = client.request_with_headers("GET", "/invoices/", token=token, headers={"If-None-Match": etag})
+    if not check("unchanged list answers 304", status == 304, str(status)):
+        return False
+
+    status, _, body = client.request_with_headers("DELETE", f"/invoices/{invoice_id}", token=token)
+    if not check("DELETE invoice with items", status == 200, f"{status}: {body[:200]!r}"):
+        return False
+    status, _, _ = client.request_with_headers("GET", "/invoices/", token=token, headers={"If-None-Match": etag})
+    if not check("old ETag no longer matches after the delete", status == 200, str(status)):
+        return False
+    status, _, _ = client.request_with_headers("GET", f"/invoices/{invoice_id}", token=token)
+    if not check("deleted invoice is gone", status == 404, str(status)):
+        return False
+
+    delta_path = f"/invoices/?since={urllib.parse.quote(since)}"
+    status, _, body = client.request_with_headers("GET", delta_path, token=token)
+    delta = json.loads(body) if status == 200 else {}
+    return check(
+        "?since= delta lists the tombstone and not the invoice",
+        invoice_id in delta.get("deleted", []) and all(row["id"] != invoice_id for row in delta.get("changed", [])),
+        f"{status}: {body[:200]!r}",
+    )
+
+
+def main():
+    with api_server() as base_url:
+        print("invoice list conditional GET and delta sync")
+        ok = run(Client(base_url))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/harness.py
+# Shared pieces of the benchmark scripts: an API server started from main.py
+# against a throwaway database, a keep-alive HTTP client and latency stats.
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def api_server(database_url: str | None = None, env_overrides: dict | None = None, workers: int = 1):
+    # Yields the base URL of a uvicorn process serving main:app. Without
+    # database_url it runs on a fresh SQLite file that is removed afterwards.
+    workdir = tempfile.mkdtemp(prefix="invoice-bench-")
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "PDF_CACHE_DIR": os.path.join(workdir, "pdfs"),
+        # Measure the API itself, not the rate limiter
+        "RATE_LIMIT_ENABLED": "false",
+        **(env_overrides or {}),
+    }
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                Client(base_url).request("GET", "/")
+                break
+            except OSError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("API server did not start")
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class Client:
+    # One keep-alive connection per thread
+    def __init__(self, base_url: str, timeout: float = 120):
+        parsed = urllib.parse.urlparse(base_url)
+        self.host, self.port, self.timeout = parsed.hostname, parsed.port, timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return connection
+
+    def request(self, method, path, **kwargs):
+        status, _, body = self.request_with_headers(method, path, **kwargs)
+        return status, body
+
+    def request_with_headers(self, method, path, body=None, form=None, token=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body, default=str).encode()
+            headers["Content-Type"] = "application/json"
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                return response.status, {name.lower(): value for name, value in response.getheaders()}, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle keep-alive connection; reconnect once
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+
+    def json(self, method, path, **kwargs):
+        status, body = self.request(method, path, **kwargs)
+        if status >= 400:
+            raise RuntimeError(f"{method} {path} -> {status}: {body[:200]!r}")
+        return json.loads(body) if body else None
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(latencies: list[float], statuses: list[int], elapsed: float) -> dict:
+    return {
+        "requests": len(statuses),
+        "errors": sum(1 for status in statuses if status >= 400),
+        "throughput_rps": len(statuses) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (max(latencies) if latencies else 0.0) * 1000,
+    }
@@ -0,0 +1,170 @@
+# benchmarks/loadtest.py
+# Reproducible API load test. Starts main:app against a temporary SQLite
+# database (or --database-url, e.g. an empty local Postgres), seeds users with
+# invoices and items, then drives each scenario at a fixed concurrency and
+# reports throughput and p50/p95/p99 latency. Results are saved as JSON and
+# can be compared with an earlier run.
+#
+#   python benchmarks/loadtest.py --users 20 --invoices 200 --concurrency 16 --output run.json
+#   python benchmarks/loadtest.py --output new.json --compare run.json
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from harness import ROOT, Client, api_server, summarize
+
+PASSWORD = "benchmark-password"
+SCENARIOS = ["register", "login", "create_invoice", "list_invoices", "get_invoice", "update_status", "download_pdf"]
+COMPARED = ["throughput_rps", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def invoice_payload(rng: random.Random, items: int) -> dict:
+    return {
+        "client_name": f"Client {rng.randint(1, 10_000)}",
+        "client_email": "client@example.com",
+        "due_date": (datetime.now(timezone.utc) + timedelta(days=rng.randint(-30, 60))).isoformat(),
+        "billing_address": "1 Market Street, Springfield",
+        "extra_information": None,
+        "items": [
+            {"title": f"Item {j}", "quantity": rng.randint(1, 5), "unit_price": round(rng.uniform(5, 500), 2)}
+            for j in range(items)
+        ],
+    }
+
+
+def seed(client: Client, args, rng: random.Random) -> list[dict]:
+    def make_user(index):
+        username = f"seed{index}"
+        client.json("POST", "/users/register", body={"username": username, "email": f"{username}@example.com", "password": PASSWORD})
+        token = client.json("POST", "/users/login", form={"username": username, "password": PASSWORD})["access_token"]
+        invoice_ids = []
+        remaining = args.invoices
+        while remaining:
+            chunk = min(remaining, 500)
+            batch = {"invoices": [invoice_payload(rng, args.items) for _ in range(chunk)]}
+            invoice_ids += [result["id"] for result in client.json("POST", "/invoices/batch", body=batch, token=token)]
+            remaining -= chunk
+        return {"username": username, "token": token, "invoice_ids": invoice_ids}
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        return list(pool.map(make_user, range(args.users)))
+
+
+def scenario_call(name: str, client: Client, users: list[dict], rng: random.Random, counter: int, items: int):
+    user = users[counter % len(users)]
+    token = user["token"]
+    if name == "register":
+        username = f"load{counter}_{rng.randint(0, 1 << 30)}"
+        return client.request("POST", "/users/register", body={"username": username, "email": f"{username}@example.com", "password": PASSWORD})
+    if name == "login":
+        return client.request("POST", "/users/login", form={"username": user["username"], "password": PASSWORD})
+    if name == "create_invoice":
+        return client.request("POST", "/invoices/", body=invoice_payload(rng, items), token=token)
+    if name == "list_invoices":
+        return client.request("GET", "/invoices/?limit=50&sort=-created_at", token=token)
+    invoice_id = rng.choice(user["invoice_ids"])
+    if name == "get_invoice":
+        return client.request("GET", f"/invoices/{invoice_id}", token=token)
+    if name == "update_status":
+        status = rng.choice(["paid", "unpaid"])
+        return client.request("PATCH", f"/invoices/{invoice_id}/status?status={status}", token=token)
+    if name == "download_pdf":
+        return client.request("GET", f"/invoices/{invoice_id}/download", token=token)
+    raise ValueError(name)
+
+
+def run_scenario(name: str, client: Client, users: list[dict], args) -> dict:
+    latencies, statuses = [], []
+
+    def one(counter):
+        rng = random.Random(args.seed * 1_000_003 + counter)
+        start = time.perf_counter()
+        status, _ = scenario_call(name, client, users, rng, counter, args.items)
+        return time.perf_counter() - start, status
+
+    requests = args.requests if name not in ("register", "login", "download_pdf") else max(1, args.requests // 4)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for latency, status in pool.map(one, range(requests)):
+            latencies.append(latency)
+            statuses.append(status)
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict, baseline: dict | None) -> None:
+    print(f"{'scenario':<16}{'req':>7}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<16}{result['requests']:>7}{result['errors']:>6}{result['throughput_rps']:>10.1f}"
+            f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+        )
+        previous = (baseline or {}).get(name)
+        if previous:
+            deltas = []
+            for key in COMPARED:
+                if previous.get(key):
+                    deltas.append(f"{key} {(result[key] - previous[key]) / previous[key] * 100:+.1f}%")
+            print(f"{'':<16}vs baseline: {', '.join(deltas)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Invoice API load test")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--invoices", type=int, default=100, help="invoices seeded per user")
+    parser.add_argument("--items", type=int, default=5, help="items per invoice")
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--database-url", help="use this (empty) database instead of a temporary SQLite file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    with api_server(args.database_url, workers=args.workers) as base_url:
+        client = Client(base_url)
+        rng = random.Random(args.seed)
+        started = time.perf_counter()
+        users = seed(client, args, rng)
+        print(f"seeded {args.users} users x {args.invoices} invoices in {time.perf_counter() - started:.1f}s")
+        results = {name: run_scenario(name, client, users, args) for name in args.scenarios}
+
+    print_results(results, baseline)
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "git_revision": git_revision(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "database": "custom" if args.database_url else "sqlite",
+                "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "database_url")},
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
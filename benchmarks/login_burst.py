@@ -0,0 +1,80 @@
+# benchmarks/login_burst.py
+# Starts the API against a throwaway SQLite database, then fires a burst of
+# concurrent logins while a probe thread keeps calling GET /invoices/.
+# Reports login throughput and probe latency before and during the burst.
+#
+#   python benchmarks/login_burst.py --logins 200 --concurrency 32
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import Client, api_server, percentile
+
+PASSWORD = "benchmark-password"
+
+
+def probe(client, token, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        client.request("GET", "/invoices/?limit=20", token=token)
+        samples.append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login burst benchmark")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    with api_server() as base_url:
+        client = Client(base_url)
+        users = [f"bench{i}" for i in range(args.users)]
+        for username in users:
+            client.request("POST", "/users/register", body={"username": username, "email": f"{username}@example.com", "password": PASSWORD})
+        _, body = client.request("POST", "/users/login", form={"username": users[0], "password": PASSWORD})
+        token = json.loads(body)["access_token"]
+
+        # Probe latency with no logins in flight
+        stop = threading.Event()
+        baseline = []
+        thread = threading.Thread(target=probe, args=(client, token, stop, baseline))
+        thread.start()
+        time.sleep(args.baseline_seconds)
+        stop.set()
+        thread.join()
+
+        # Probe latency during the burst
+        stop = threading.Event()
+        during = []
+        thread = threading.Thread(target=probe, args=(client, token, stop, during))
+        thread.start()
+        statuses = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for status, _ in pool.map(
+                lambda i: client.request("POST", "/users/login", form={"username": users[i % len(users)], "password": PASSWORD}),
+                range(args.logins),
+            ):
+                statuses.append(status)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        thread.join()
+
+        ok = statuses.count(200)
+        print(f"logins: {ok}/{len(statuses)} ok ({statuses.count(503)} shed with 503) in {elapsed:.2f}s -> {ok / elapsed:.1f}/s")
+        for label, samples in (("baseline", baseline), ("during burst", during)):
+            print(
+                f"GET /invoices/ {label}: n={len(samples)} "
+                f"p50={percentile(samples, 50) * 1000:.1f}ms "
+                f"p99={percentile(samples, 99) * 1000:.1f}ms "
+                f"mean={(statistics.mean(samples) if samples else 0) * 1000:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
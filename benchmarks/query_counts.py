@@ -0,0 +1,166 @@
+# benchmarks/query_counts.py
+# Two parts:
+#   1. In-process, on a throwaway SQLite database holding one user with
+#      --invoices invoices of --items items each: query count and time to load
+#      and serialize the invoice list with lazy items (before) and with
+#      selectinload (after, what the routes do).
+#   2. Against a running API started with QUERY_COUNT_HEADER=true: the
+#      X-DB-Queries count of the invoice read routes for a user with a handful
+#      of invoices and for one with --invoices of them. The counts must match;
+#      any route whose count grows with the data fails the check.
+#
+#   python benchmarks/query_counts.py --invoices 1000 --items 10
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from harness import ROOT, Client, api_server, percentile
+
+workdir = tempfile.mkdtemp(prefix="invoice-queries-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'queries.db')}"
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+import database, metrics, models, schemas  # noqa: E402
+
+PASSWORD = "benchmark-password"
+SMALL_INVOICES = 10
+REPEAT = 5
+
+
+# --- In-process: lazy vs eager items ---
+def seed_database(invoice_count: int, item_count: int) -> int:
+    now = datetime(2026, 1, 1)
+    with Session(database.engine) as session:
+        connection = session.connection()
+        user_id = connection.execute(
+            insert(models.User.__table__).returning(models.User.__table__.c.id),
+            {"username": "bench", "email": "bench@example.com", "hashed_password": "x"},
+        ).scalar_one()
+        invoice_table = models.Invoice.__table__
+        invoice_ids = connection.execute(
+            insert(invoice_table).returning(invoice_table.c.id, sort_by_parameter_order=True),
+            [
+                {
+                    "client_name": f"Client {i}", "client_email": f"client{i}@example.com",
+                    "due_date": now + timedelta(days=30), "status": "unpaid", "currency": "USD",
+                    "total_minor": item_count * 1000, "owner_id": user_id, "created_at": now + timedelta(seconds=i),
+                    "billing_address": "1 Market Street", "updated_at": now,
+                }
+                for i in range(invoice_count)
+            ],
+        ).scalars().all()
+        connection.execute(insert(models.InvoiceItem.__table__), [
+            {"title": f"Item {j}", "quantity": 1, "unit_price_minor": 1000, "subtotal_minor": 1000, "invoice_id": invoice_id, "updated_at": now}
+            for invoice_id in invoice_ids
+            for j in range(item_count)
+        ])
+        session.commit()
+    return user_id
+
+
+def load_list(user_id: int, eager: bool) -> tuple[int, float]:
+    query = select(models.Invoice).where(models.Invoice.owner_id == user_id).order_by(models.Invoice.created_at, models.Invoice.id)
+    if eager:
+        query = query.options(selectinload(models.Invoice.items))
+    with Session(database.engine) as session, metrics.count_queries() as stats:
+        start = time.perf_counter()
+        # Serializing touches invoice.items, which is where lazy loading runs its queries
+        [schemas.InvoiceRead.model_validate(invoice, from_attributes=True) for invoice in session.exec(query).all()]
+        return stats["queries"], time.perf_counter() - start
+
+
+def compare_loading(invoice_count: int, item_count: int) -> bool:
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=ROOT, env=os.environ, check=True, stdout=subprocess.DEVNULL,
+    )
+    user_id = seed_database(invoice_count, item_count)
+    print(f"invoice list, {invoice_count} invoices x {item_count} items (in-process)")
+    for label, eager in (("before (lazy items)", False), ("after (selectinload)", True)):
+        runs = [load_list(user_id, eager) for _ in range(REPEAT)]
+        print(f"  {label:<22} queries={runs[0][0]:<6} mean={statistics.mean(seconds for _, seconds in runs) * 1000:.1f}ms")
+    try:
+        with metrics.assert_max_queries(2):
+            load_list(user_id, eager=True)
+    except AssertionError as e:
+        print(f"  FAILED: {str(e).splitlines()[0]}")
+        return False
+    return True
+
+
+# --- Over HTTP: per-route counts must not depend on the data ---
+def seed_user(client: Client, username: str, invoice_count: int, item_count: int) -> tuple[str, int]:
+    client.json("POST", "/users/register", body={"username": username, "email": f"{username}@example.com", "password": PASSWORD})
+    token = client.json("POST", "/users/login", form={"username": username, "password": PASSWORD})["access_token"]
+    due_date = (datetime.now() + timedelta(days=30)).isoformat()
+    invoice = {
+        "client_name": "Acme Corp", "client_email": "billing@acme.test", "due_date": due_date,
+        "billing_address": "1 Market Street",
+        "items": [{"title": f"Item {j}", "quantity": 1, "unit_price": "10.00"} for j in range(item_count)],
+    }
+    invoice_ids = []
+    for start in range(0, invoice_count, 1000):
+        batch = {"invoices": [invoice] * min(1000, invoice_count - start)}
+        invoice_ids += [result["id"] for result in client.json("POST", "/invoices/batch", body=batch, token=token)]
+    return token, invoice_ids[0]
+
+
+def route_counts(client: Client, token: str, invoice_id: int) -> dict:
+    counts = {}
+    for label, path in (
+        ("GET /invoices/", "/invoices/"),
+        ("GET /invoices/?limit=50", "/invoices/?limit=50"),
+        ("GET /invoices/summary", "/invoices/summary"),
+        ("GET /invoices/{id}", f"/invoices/{invoice_id}"),
+    ):
+        samples = []
+        # The first call warms the auth caches, so only the later ones are counted
+        for attempt in range(REPEAT + 1):
+            start = time.perf_counter()
+            status, headers, _ = client.request_with_headers("GET", path, token=token)
+            if attempt:
+                samples.append(time.perf_counter() - start)
+        counts[label] = (status, int(headers.get("x-db-queries", -1)), percentile(samples, 50))
+    return counts
+
+
+def check_routes(invoice_count: int, item_count: int) -> bool:
+    with api_server(env_overrides={"QUERY_COUNT_HEADER": "true"}) as base_url:
+        client = Client(base_url)
+        small = route_counts(client, *seed_user(client, "small", SMALL_INVOICES, item_count))
+        large = route_counts(client, *seed_user(client, "large", invoice_count, item_count))
+    print(f"queries per route, {SMALL_INVOICES} vs {invoice_count} invoices x {item_count} items (over HTTP)")
+    failed = False
+    for label, (status, queries, _) in small.items():
+        large_status, large_queries, large_p50 = large[label]
+        grows = queries < 0 or queries != large_queries or status != 200 or large_status != 200
+        failed = failed or grows
+        print(f"  {'GROWS' if grows else 'ok':<7}{label:<26} {queries} -> {large_queries} queries, p50 at {invoice_count}: {large_p50 * 1000:.1f}ms")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Invoice read path query counts")
+    parser.add_argument("--invoices", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=10)
+    args = parser.parse_args()
+    try:
+        loading_ok = compare_loading(args.invoices, args.items)
+        routes_ok = check_routes(args.invoices, args.items)
+        sys.exit(0 if loading_ok and routes_ok else 1)
+    finally:
+        database.engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
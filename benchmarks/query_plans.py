@@ -0,0 +1,96 @@
+# benchmarks/query_plans.py
+# Migrates a throwaway SQLite database to head, runs the queries behind the
+# hot routes and checks their EXPLAIN QUERY PLAN: any full table scan fails
+# the check, temp B-trees for sorting are reported.
+#
+#   python benchmarks/query_plans.py
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from harness import ROOT
+
+workdir = tempfile.mkdtemp(prefix="invoice-plans-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'plans.db')}"
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import and_, event, func, or_, text  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+import database, models  # noqa: E402
+
+NOW = datetime(2026, 1, 1)
+
+
+def checks():
+    invoice, item, job, tombstone = models.Invoice, models.InvoiceItem, models.Job, models.Tombstone
+    return {
+        "POST /users/login": select(models.User).where(models.User.username == "someone"),
+        "GET /invoices/": select(invoice).where(invoice.owner_id == 1).order_by(invoice.created_at, invoice.id).limit(51),
+        "GET /invoices/?sort=-created_at": select(invoice).where(invoice.owner_id == 1).order_by(invoice.created_at.desc(), invoice.id.desc()).limit(51),
+        "GET /invoices/?status=": select(invoice).where(invoice.owner_id == 1, invoice.status == "unpaid").limit(51),
+        "invoice items (selectinload)": select(item).where(item.invoice_id.in_([1, 2, 3])).order_by(item.id),
+        "GET /invoices/ (ETag)": select(func.count(), func.max(invoice.updated_at)).where(invoice.owner_id == 1),
+        "GET /invoices/?since=": select(invoice).where(invoice.owner_id == 1, invoice.updated_at > NOW).order_by(invoice.updated_at, invoice.id),
+        "GET /invoices/?since= (deleted)": select(tombstone.record_id).where(
+            tombstone.owner_id == 1, tombstone.kind == "invoice", tombstone.deleted_at > NOW,
+        ).distinct(),
+        "GET /accounts/ (ETag)": select(func.count(), func.max(models.Account.updated_at)).where(models.Account.user_id == 1),
+        "GET /invoices/{id}": select(invoice).where(invoice.id == 1, invoice.owner_id == 1),
+        "GET /invoices/summary": select(func.count(), func.sum(invoice.total_minor)).where(invoice.owner_id == 1),
+        "GET /invoices/search": text(
+            "SELECT rowid FROM invoice_search WHERE invoice_search MATCH :match "
+            "ORDER BY bm25(invoice_search), rowid DESC LIMIT 21"
+        ).bindparams(match='owner : "u1" AND {client_name items} : ("acme"*)'),
+        "issuer profile": select(models.Profile).where(models.Profile.user_id == 1),
+        "issuer account": select(models.Account).where(models.Account.user_id == 1),
+        "overdue reminder scan": select(invoice.id).where(
+            invoice.status == "unpaid",
+            invoice.due_date < NOW,
+            or_(invoice.reminded_at.is_(None), invoice.reminded_at < NOW - timedelta(days=7)),
+        ).order_by(invoice.due_date).limit(500),
+        "job claim": select(job.id).where(or_(
+            and_(job.status == "queued", job.run_at <= NOW),
+            and_(job.status == "running", job.locked_at < NOW - timedelta(minutes=10)),
+        )).order_by(job.run_at).limit(1),
+        "tombstone pruning": select(tombstone.id).where(tombstone.deleted_at < NOW),
+    }
+
+
+def main():
+    try:
+        subprocess.run(
+            [sys.executable, "-m", "alembic", "upgrade", "head"],
+            cwd=ROOT, env=os.environ, check=True, stdout=subprocess.DEVNULL,
+        )
+        plans = []
+
+        @event.listens_for(database.engine, "before_cursor_execute")
+        def explain(conn, cursor, statement, parameters, context, executemany):
+            rows = cursor.connection.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+            plans.append([row[3] for row in rows])
+
+        failed = False
+        with Session(database.engine) as session:
+            for name, statement in checks().items():
+                plans.clear()
+                session.connection().execute(statement).all()
+                details = [detail for plan in plans for detail in plan]
+                scans = [d for d in details if d.startswith("SCAN ") and " USING " not in d and "VIRTUAL TABLE" not in d]
+                sorts = [d for d in details if "TEMP B-TREE" in d]
+                failed = failed or bool(scans)
+                print(f"{'FULL SCAN' if scans else 'ok':<10}{name}")
+                for detail in details:
+                    print(f"{'':<10}  {detail}")
+                if sorts and not scans:
+                    print(f"{'':<10}  (sorts in a temp B-tree)")
+        sys.exit(1 if failed else 0)
+    finally:
+        database.engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/render_pdf.py
+# Measures PDF render time per invoice in-process: the print template with the
+# pre-parsed local stylesheet (what the render pool runs) and, with --legacy,
+# the original CDN-styled templates/invoice.html for comparison.
+#
+#   python benchmarks/render_pdf.py --invoices 50 --items 20 --legacy
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from jinja2 import Environment, FileSystemLoader  # noqa: E402
+import render_pool  # noqa: E402
+
+
+def sample_context(invoice_id: int, item_count: int) -> dict:
+    items = [
+        {"title": f"Consulting block {i}", "quantity": i % 5 + 1, "unit_price": 120.0, "subtotal": (i % 5 + 1) * 120.0}
+        for i in range(item_count)
+    ]
+    return {
+        "invoice": {
+            "id": invoice_id,
+            "client_name": "Acme Corp",
+            "client_email": "billing@acme.test",
+            "due_date": datetime.now() + timedelta(days=30),
+            "status": "unpaid",
+            "billing_address": "1 Market Street, Springfield",
+            "extra_information": "Payment within 30 days.",
+            "created_at": datetime.now(),
+            "currency": "USD",
+            "currency_symbol": "$",
+            "total": sum(item["subtotal"] for item in items),
+            "items": items,
+        },
+        "profile": {"firstname": "Ada", "lastname": "Lovelace", "business_name": "Ada Consulting", "address": "42 Analytical Way", "profile_picture": None},
+        "account": {"account_name": "Ada Consulting", "account_number": "12345678", "bank_name": "First Bank", "paypal_ID": None},
+    }
+
+
+def report(label: str, samples: list[float]) -> None:
+    ordered = sorted(samples)
+    print(
+        f"{label}: n={len(samples)} mean={statistics.mean(samples) * 1000:.1f}ms "
+        f"p50={ordered[len(ordered) // 2] * 1000:.1f}ms max={ordered[-1] * 1000:.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Invoice PDF render benchmark")
+    parser.add_argument("--invoices", type=int, default=30)
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--legacy", action="store_true", help="also time templates/invoice.html")
+    args = parser.parse_args()
+
+    env = Environment(loader=FileSystemLoader("templates"))
+    contexts = [sample_context(i + 1, args.items) for i in range(args.invoices)]
+
+    # First render pays for parsing the stylesheet and loading fonts
+    start = time.perf_counter()
+    render_pool._render(env.get_template("invoice_print.html").render(contexts[0]))
+    print(f"print template, first render: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    samples = []
+    for context in contexts:
+        html = env.get_template("invoice_print.html").render(context)
+        samples.append(render_pool._render(html)[1])
+    report("print template", samples)
+
+    if args.legacy:
+        from weasyprint import HTML
+
+        samples = []
+        for context in contexts:
+            html = env.get_template("invoice.html").render(context)
+            start = time.perf_counter()
+            HTML(string=html).write_pdf()
+            samples.append(time.perf_counter() - start)
+        report("legacy template", samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/serialization.py
+# Serialization time and payload size of invoice lists: the response_model
+# path (pydantic validation + json.dumps, what JSONResponse did) against the
+# same validation + orjson (ORJSONResponse), plus gzip/brotli payload sizes.
+#
+#   python benchmarks/serialization.py --sizes 1000 10000
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import brotli  # noqa: E402
+import orjson  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+import schemas  # noqa: E402
+
+
+def sample_invoices(count: int, items: int) -> list[dict]:
+    now = datetime.now()
+    return [
+        {
+            "id": i,
+            "client_name": f"Client {i}",
+            "client_email": f"client{i}@example.com",
+            "due_date": now + timedelta(days=30),
+            "status": "paid" if i % 3 == 0 else "unpaid",
+            "currency": "USD",
+            "total": 120.0 * items,
+            "created_at": now,
+            "billing_address": f"{i} Main Street, Springfield",
+            "extra_information": None,
+            "items": [
+                {"id": i * items + j, "title": f"Item {j}", "quantity": 1, "unit_price": 120.0, "subtotal": 120.0}
+                for j in range(items)
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Invoice list serialization benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(List[schemas.InvoiceRead])
+    for size in args.sizes:
+        invoices = sample_invoices(size, args.items)
+        validated = adapter.validate_python(invoices)
+
+        def stdlib():
+            content = adapter.dump_python(validated, mode="json")
+            return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+        def fast():
+            return orjson.dumps(adapter.dump_python(validated, mode="json"))
+
+        stdlib_time, stdlib_body = timed(stdlib, args.repeat)
+        orjson_time, orjson_body = timed(fast, args.repeat)
+        gzip_body = gzip.compress(orjson_body, compresslevel=6)
+        brotli_body = brotli.compress(orjson_body, quality=4)
+
+        print(f"{size} invoices x {args.items} items")
+        print(f"  json.dumps : {stdlib_time * 1000:8.1f}ms  {len(stdlib_body):>10} bytes")
+        print(f"  orjson     : {orjson_time * 1000:8.1f}ms  {len(orjson_body):>10} bytes")
+        print(f"  + gzip     : {len(gzip_body):>21} bytes")
+        print(f"  + brotli   : {len(brotli_body):>21} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# benchmarks/static_bytes.py
+# Replays page loads of static assets against a running server the way a
+# browser cache would: the first load is cold, repeat loads skip assets served
+# as immutable and revalidate the rest with If-None-Match. Reports the bytes
+# transferred per load.
+#
+#   python benchmarks/static_bytes.py --base-url http://127.0.0.1:8000 \
+#       /static/pdf/invoice.css /static/profile_pics/<hash>_md.webp
+import argparse
+import urllib.error
+import urllib.request
+
+
+def fetch(url: str, etag: str | None):
+    headers = {"Accept-Encoding": "br, gzip"}
+    if etag:
+        headers["If-None-Match"] = etag
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return resp.status, resp.headers, len(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, len(e.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static asset bytes per page load")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--loads", type=int, default=3)
+    parser.add_argument("paths", nargs="*", default=["/static/pdf/invoice.css"])
+    args = parser.parse_args()
+
+    cache = {}  # path -> (etag, immutable)
+    for load in range(1, args.loads + 1):
+        transferred = 0
+        requests = 0
+        for path in args.paths:
+            etag, immutable = cache.get(path, (None, False))
+            if immutable:
+                continue
+            status, headers, size = fetch(args.base_url + path, etag)
+            requests += 1
+            transferred += size
+            if status == 200:
+                cache[path] = (headers.get("ETag"), "immutable" in (headers.get("Cache-Control") or ""))
+        print(f"load {load}: {requests} requests, {transferred} body bytes")
+
+
+if __name__ == "__main__":
+    main()
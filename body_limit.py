@@ -0,0 +1,58 @@
+# app/body_limit.py
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class BodyLimitMiddleware:
+    # Caps request bodies on the given paths before FastAPI parses (and spools)
+    # them: a declared Content-Length over the limit is refused without reading
+    # the body, and a body that turns out longer is cut off as soon as it passes it
+    def __init__(self, app, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        rejection = JSONResponse({"detail": "Request body is too large"}, status_code=413)
+        declared = Headers(scope=scope).get("content-length")
+        if declared and declared.isdigit() and int(declared) > limit:
+            await rejection(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise BodyTooLarge()
+            return message
+
+        async def send_wrapper(message):
+            nonlocal started
+            # FastAPI turns the aborted parse into a 400; that answer is replaced below
+            if exceeded:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, send_wrapper)
+        except BodyTooLarge:
+            pass
+        if exceeded and not started:
+            await rejection(scope, receive, send)
@@ -1,10 +1,89 @@
 # app/database.py
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlmodel import SQLModel, create_engine, Session
 
-DATABASE_URL = "sqlite:///./invoices.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./invoices.db")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Async drivers used when the async session is requested for a sync URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+url = make_url(DATABASE_URL)
+IS_SQLITE = url.get_backend_name() == "sqlite"
+
+
+def _engine_options() -> dict:
+    options = {"echo": DB_ECHO}
+    if IS_SQLITE:
+        options["connect_args"] = {"check_same_thread": False}
+        # In-memory databases keep SQLAlchemy's single-connection pool
+        if url.database in (None, "", ":memory:"):
+            return options
+    else:
+        options["pool_pre_ping"] = True
+        options["pool_timeout"] = DB_POOL_TIMEOUT
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer; busy_timeout makes
+    # writers wait for the lock instead of failing with "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+engine = create_engine(DATABASE_URL, **_engine_options())
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
 
-engine = create_engine(DATABASE_URL, echo=True)
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+# --- Async ---
+_async_engine = None
+
+
+def get_async_engine():
+    # Created on first use so the async driver is only needed by deployments that use it
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        async_url = os.getenv("ASYNC_DATABASE_URL")
+        if not async_url:
+            backend = url.get_backend_name()
+            if backend not in ASYNC_DRIVERS:
+                raise RuntimeError(f"No async driver configured for '{backend}', set ASYNC_DATABASE_URL")
+            async_url = url.set(drivername=ASYNC_DRIVERS[backend])
+        _async_engine = create_async_engine(async_url, **_engine_options())
+        if IS_SQLITE:
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return _async_engine
+
+
+async def get_async_session():
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
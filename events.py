@@ -0,0 +1,200 @@
+# app/events.py
+# Per-user invoice events streamed on GET /invoices/events (Server-Sent Events).
+# Routers publish after they commit. Every open stream gets a bounded queue;
+# a stream that falls behind has its backlog replaced by a single "resync"
+# event, and the client reloads the list instead of the server buffering
+# without limit. The memory broker reaches streams in this process only;
+# EVENTS_BROKER=redis fans events out between workers and hosts.
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "memory")  # memory or redis
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "redis://localhost:6379/0")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_MAX_STREAMS_PER_USER = int(os.getenv("EVENTS_MAX_STREAMS_PER_USER", "5"))
+EVENTS_MAX_STREAM_SECONDS = float(os.getenv("EVENTS_MAX_STREAM_SECONDS", "300"))
+
+INVOICE_CREATED = "invoice.created"
+INVOICE_UPDATED = "invoice.updated"
+INVOICE_DELETED = "invoice.deleted"
+RESYNC = "resync"
+
+REDIS_CHANNEL_PREFIX = "invoice_events:"
+RECONNECT_MILLISECONDS = 3000
+
+stats = {"streams": 0, "published": 0, "resyncs": 0}
+
+
+class Subscription:
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+
+    def deliver(self, message: tuple[str, str]) -> None:
+        # Runs on the stream's event loop
+        if self.queue.full():
+            # Too far behind: drop the backlog, the client reloads the list instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((RESYNC, "{}"))
+            stats["resyncs"] += 1
+            return
+        self.queue.put_nowait(message)
+
+
+# --- Brokers ---
+class MemoryBroker:
+    # Streams open in this process; also the local fan-out of the shared broker
+    def __init__(self):
+        self._subscriptions = {}  # user_id -> set of Subscription
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription | None:
+        # None once the user has EVENTS_MAX_STREAMS_PER_USER streams open here
+        with self._lock:
+            subscriptions = self._subscriptions.setdefault(user_id, set())
+            if len(subscriptions) >= EVENTS_MAX_STREAMS_PER_USER:
+                return None
+            subscription = Subscription(user_id, asyncio.get_running_loop())
+            subscriptions.add(subscription)
+            stats["streams"] += 1
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            if subscription in subscriptions:
+                subscriptions.discard(subscription)
+                stats["streams"] -= 1
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id: int, name: str, data: str) -> None:
+        self._dispatch(user_id, (name, data))
+
+    def _dispatch(self, user_id: int | None, message: tuple[str, str]) -> None:
+        # Safe from any thread; user_id None reaches every stream
+        with self._lock:
+            if user_id is None:
+                subscriptions = [s for group in self._subscriptions.values() for s in group]
+            else:
+                subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # The loop closed under a stream that hasn't unsubscribed yet
+                pass
+
+
+class RedisBroker(MemoryBroker):
+    # Publishes through Redis pub/sub; one listener thread per process hands
+    # messages to the streams open locally
+    def __init__(self, url: str = EVENTS_REDIS_URL):
+        super().__init__()
+        # Imported here so only deployments using it need the redis package
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+
+    def subscribe(self, user_id: int) -> Subscription | None:
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="events-redis", daemon=True)
+                self._listener.start()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id: int, name: str, data: str) -> None:
+        self._client.publish(f"{REDIS_CHANNEL_PREFIX}{user_id}", json.dumps([name, data]))
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{REDIS_CHANNEL_PREFIX}*")
+                for message in pubsub.listen():
+                    user_id = int(message["channel"].decode()[len(REDIS_CHANNEL_PREFIX):])
+                    name, data = json.loads(message["data"])
+                    self._dispatch(user_id, (name, data))
+            except Exception:
+                logger.exception("lost the Redis event subscription, reconnecting")
+                # Events published meanwhile are gone, so every stream starts over
+                self._dispatch(None, (RESYNC, "{}"))
+                time.sleep(1)
+
+
+BACKENDS = {
+    "memory": MemoryBroker,
+    "redis": RedisBroker,
+}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if EVENTS_BROKER not in BACKENDS:
+                raise RuntimeError(f"Unknown EVENTS_BROKER '{EVENTS_BROKER}', expected one of {', '.join(BACKENDS)}")
+            _broker = BACKENDS[EVENTS_BROKER]()
+        return _broker
+
+
+# --- Publishing ---
+def publish(user_id: int, name: str, data: str) -> None:
+    # Called after the change is committed; a lost event must not fail the request
+    try:
+        get_broker().publish(user_id, name, data)
+        stats["published"] += 1
+    except Exception:
+        logger.exception("could not publish %s for user %s", name, user_id)
+
+
+# --- Streaming ---
+def _format(event_id: int, name: str, data: str) -> str:
+    return f"id: {event_id}\nevent: {name}\ndata: {data}\n\n"
+
+
+async def stream(subscription: Subscription, resync: bool = False):
+    # Event ids only number this connection. A reconnecting client sends the
+    # last one back, and since nothing is kept for it, it is told to resync.
+    # Ends when StreamingResponse cancels it on disconnect, or after
+    # EVENTS_MAX_STREAM_SECONDS: uvicorn waits for open connections before it
+    # shuts down, so no stream may hold a worker open for good. EventSource
+    # reconnects on its own.
+    try:
+        event_id = 0
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + EVENTS_MAX_STREAM_SECONDS
+        # The id makes even a stream that saw no events send Last-Event-ID, and so resync, on reconnect
+        yield f"retry: {RECONNECT_MILLISECONDS}\nid: {event_id}\n\n"
+        if resync:
+            event_id += 1
+            yield _format(event_id, RESYNC, "{}")
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                name, data = await asyncio.wait_for(subscription.queue.get(), min(EVENTS_HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                if loop.time() >= deadline:
+                    return
+                # Keeps proxies from closing an idle connection
+                yield ": heartbeat\n\n"
+                continue
+            event_id += 1
+            yield _format(event_id, name, data)
+    finally:
+        get_broker().unsubscribe(subscription)
@@ -31,6 +31,16 @@ const api = {
     return response.json();
   },
 
+  subscribeToInvoices(token, handlers) {
+    // Server-Sent Events; EventSource can't send headers, so the token goes in the URL.
+    // Returns a function that closes the stream.
+    const source = new EventSource(`/invoices/events?token=${encodeURIComponent(token)}`);
+    for (const [name, handler] of Object.entries(handlers)) {
+      source.addEventListener(name, (e) => handler(JSON.parse(e.data)));
+    }
+    return () => source.close();
+  },
+
   async createInvoice(invoiceData, token) {
     const response = await fetch('/invoices/', {
       method: 'POST',
@@ -1332,13 +1342,30 @@ function App() {
     }
   };
 
+  // Keep the open invoice in step with changes made in other sessions
+  useEffect(() => {
+    const token = localStorage.getItem('token');
+    if (!isAuthenticated || !token) {
+      return undefined;
+    }
+    return api.subscribeToInvoices(token, {
+      'invoice.updated': (invoice) => setSelectedInvoice((current) => (
+        current && current.id === invoice.id ? { ...current, ...invoice } : current
+      )),
+      'invoice.deleted': ({ id }) => setSelectedInvoice((current) => (
+        current && current.id === id ? null : current
+      )),
+    });
+  }, [isAuthenticated]);
+
   const handleUpdateInvoiceStatus = async (invoiceId, status) => {
     try {
       await fetch(`/invoices/${invoiceId}/status?status=${status}`, {
         method: 'PATCH',
         headers: { 'Authorization': `Bearer ${localStorage.getItem('token')}` }
       });
-      // Update local state or refetch data
+      // Applied locally; other sessions get it from the event stream
+      setSelectedInvoice((current) => (current && current.id === invoiceId ? { ...current, status } : current));
     } catch (error) {
       alert('Failed to update invoice status');
     }
@@ -0,0 +1,64 @@
+# app/images.py
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PICS_DIR = "static/profile_pics"
+
+# name -> (longest side in px, format, extension)
+VARIANTS = {
+    "sm": (256, "PNG", ".png"),  # embedded in invoice PDFs
+    "md": (768, "WEBP", ".webp"),  # shown in the UI
+}
+
+# Magic numbers of the formats accepted as profile pictures
+SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+]
+
+
+def sniff_extension(head: bytes) -> str | None:
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def variant_name(filename: str, variant: str) -> str:
+    stem, _ = os.path.splitext(filename)
+    return f"{stem}_{variant}{VARIANTS[variant][2]}"
+
+
+def existing_variant(directory: str, filename: str | None, variant: str) -> str | None:
+    # Falls back to the original while the variant hasn't been generated yet
+    if not filename:
+        return filename
+    name = variant_name(filename, variant)
+    return name if os.path.exists(os.path.join(directory, name)) else filename
+
+
+def make_variants(directory: str, filename: str) -> None:
+    # Runs as a background task after the upload response has been sent
+    from PIL import Image
+
+    try:
+        with Image.open(os.path.join(directory, filename)) as image:
+            image.load()
+            for variant, (size, image_format, _) in VARIANTS.items():
+                resized = image.copy()
+                resized.thumbnail((size, size))
+                if resized.mode not in ("RGB", "RGBA"):
+                    resized = resized.convert("RGBA")
+                target = os.path.join(directory, variant_name(filename, variant))
+                tmp_target = f"{target}.tmp"
+                resized.save(tmp_target, format=image_format, optimize=True)
+                os.replace(tmp_target, target)
+    except Exception:
+        logger.exception("Could not create variants of %s", filename)
+
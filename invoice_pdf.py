@@ -0,0 +1,88 @@
+# app/invoice_pdf.py
+from typing import List
+from fastapi import Request
+from fastapi.templating import Jinja2Templates
+from sqlmodel import Session, select
+import models, images, money
+
+templates = Jinja2Templates(directory="templates")
+
+
+def invoice_data(invoice: models.Invoice, items: List[models.InvoiceItem]) -> dict:
+    return {
+        "id": invoice.id,
+        "client_name": invoice.client_name,
+        "client_email": invoice.client_email,
+        "due_date": invoice.due_date,
+        "status": invoice.status,
+        "billing_address": invoice.billing_address,
+        "extra_information": invoice.extra_information,
+        "created_at": invoice.created_at,
+        "currency": invoice.currency,
+        "currency_symbol": money.symbol(invoice.currency),
+        "total": float(invoice.total),  # Ensure it's a float
+        "items": [
+            {
+                "title": item.title,
+                "quantity": int(item.quantity),  # Ensure it's an int
+                "unit_price": float(item.unit_price),  # Ensure it's a float
+                "subtotal": float(item.subtotal)  # Ensure it's a float
+            }
+            for item in items
+        ]
+    }
+
+
+def issuer_data(session: Session, user_id: int):
+    # Get user profile - explicit query to avoid relationship issues
+    user_profile = session.exec(
+        select(models.Profile).where(models.Profile.user_id == user_id)
+    ).first()
+
+    # Get user account (optional)
+    user_account = session.exec(
+        select(models.Account).where(models.Account.user_id == user_id)
+    ).first()
+
+    # Prepare profile data with safe defaults
+    profile = {
+        "firstname": user_profile.firstname if user_profile else "User",
+        "lastname": user_profile.lastname if user_profile else "",
+        "business_name": user_profile.business_name if user_profile else None,
+        "address": user_profile.address if user_profile else None,
+        # The small variant keeps PDFs light; the original is used until it exists
+        "profile_picture": images.existing_variant(images.PROFILE_PICS_DIR, user_profile.profile_picture, "sm") if user_profile else None
+    }
+
+    # Prepare account data (optional)
+    account = None
+    if user_account:
+        account = {
+            "account_name": user_account.account_name,
+            "account_number": user_account.account_number,
+            "bank_name": user_account.bank_name,
+            "paypal_ID": user_account.paypal_ID
+        }
+
+    return profile, account
+
+
+def issuer_snapshot(session: Session, user_id: int) -> dict:
+    profile, account = issuer_data(session, user_id)
+    return {"profile": profile, "account": account}
+
+
+def invoice_issuer(session: Session, invoice: models.Invoice):
+    # Invoices created before snapshots existed fall back to the live profile and account
+    if invoice.issuer_snapshot:
+        return invoice.issuer_snapshot["profile"], invoice.issuer_snapshot["account"]
+    return issuer_data(session, invoice.owner_id)
+
+
+def render_html(invoice_data: dict, profile: dict, account: dict | None, request: Request = None) -> str:
+    return templates.get_template("invoice_print.html").render({
+        "request": request,
+        "invoice": invoice_data,
+        "profile": profile,
+        "account": account,
+    })
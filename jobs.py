@@ -0,0 +1,294 @@
+# app/jobs.py
+# Background jobs stored in the application database: invoice emails and
+# overdue reminders. Workers and the reminder scheduler run next to the API:
+#
+#   python -m jobs worker --processes 2
+#   python -m jobs scheduler            (or: python -m jobs scheduler --once, e.g. from cron)
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+import database, invoice_pdf, mail, models, money, pdf_cache, render_pool, sync
+
+logger = logging.getLogger("invoice_api.jobs")
+
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "30"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "3600"))
+JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", "600"))
+REMINDER_INTERVAL_DAYS = int(os.getenv("REMINDER_INTERVAL_DAYS", "7"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+SCHEDULER_INTERVAL = float(os.getenv("SCHEDULER_INTERVAL", "300"))
+
+LOG_FORMAT = "%(asctime)s %(name)s %(levelname)s %(message)s"
+
+SEND_INVOICE = "send_invoice"
+OVERDUE_REMINDER = "overdue_reminder"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# --- Queue ---
+def _job_row(kind: str, payload: dict, run_at: datetime, now: datetime) -> dict:
+    return {
+        "kind": kind,
+        "payload": json.dumps(payload),
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": JOB_MAX_ATTEMPTS,
+        "run_at": run_at,
+        "created_at": now,
+    }
+
+
+def enqueue(session: Session, kind: str, payload: dict, run_at: datetime | None = None) -> models.Job:
+    # Added to the caller's transaction; the job exists once the caller commits
+    now = _utcnow()
+    job = models.Job(**_job_row(kind, payload, run_at or now, now))
+    session.add(job)
+    session.flush()
+    return job
+
+
+def enqueue_many(session: Session, kind: str, payloads: list[dict]) -> None:
+    # One executemany for the whole batch
+    if not payloads:
+        return
+    now = _utcnow()
+    session.connection().execute(
+        insert(models.Job.__table__),
+        [_job_row(kind, payload, now, now) for payload in payloads],
+    )
+
+
+def _due(now: datetime):
+    # Queued jobs whose time has come, plus jobs whose worker died mid-run
+    stale = now - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    return or_(
+        and_(models.Job.status == "queued", models.Job.run_at <= now),
+        and_(models.Job.status == "running", models.Job.locked_at < stale),
+    )
+
+
+def claim(session: Session, worker_id: str) -> models.Job | None:
+    while True:
+        now = _utcnow()
+        job_id = session.exec(
+            select(models.Job.id).where(_due(now)).order_by(models.Job.run_at).limit(1)
+        ).first()
+        if job_id is None:
+            session.commit()
+            return None
+        # Re-checks the condition, so only one worker's UPDATE matches a given job
+        result = session.connection().execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, _due(now))
+            .values(status="running", locked_by=worker_id, locked_at=now, attempts=models.Job.attempts + 1)
+        )
+        session.commit()
+        if result.rowcount == 1:
+            return session.get(models.Job, job_id)
+
+
+def backoff_seconds(attempts: int) -> float:
+    # Exponential with jitter so failed jobs don't all come back at once
+    delay = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_SECONDS * 2 ** max(0, attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def _finish(session: Session, job: models.Job, error: str | None = None) -> None:
+    if error is None:
+        job.status = "done"
+    elif job.attempts >= job.max_attempts:
+        job.status = "failed"
+    else:
+        job.status = "queued"
+        job.run_at = _utcnow() + timedelta(seconds=backoff_seconds(job.attempts))
+    job.last_error = error
+    job.locked_by = None
+    job.locked_at = None
+    session.add(job)
+    session.commit()
+
+
+# --- Handlers ---
+def _invoice_pdf(session: Session, invoice: models.Invoice) -> tuple[bytes, dict]:
+    # Shares the API's PDF cache, so a retry (or a later download) reuses this render
+    invoice_data = invoice_pdf.invoice_data(invoice, invoice.items)
+    profile, account = invoice_pdf.invoice_issuer(session, invoice)
+    key = pdf_cache.cache_key(invoice_data, profile, account)
+    pdf_bytes = pdf_cache.get(invoice.owner_id, invoice.id, key)
+    if pdf_bytes is None:
+        pdf_bytes = render_pool.render_local(invoice_pdf.render_html(invoice_data, profile, account))
+        pdf_cache.put(invoice.owner_id, invoice.id, key, pdf_bytes)
+    return pdf_bytes, profile
+
+
+def _send_invoice_email(session: Session, payload: dict, reminder: bool) -> None:
+    invoice = session.exec(
+        select(models.Invoice)
+        .where(models.Invoice.id == payload["invoice_id"])
+        .options(selectinload(models.Invoice.items))
+    ).first()
+    if invoice is None:
+        logger.info("invoice %s was deleted, not sending", payload["invoice_id"])
+        return
+    if reminder and invoice.status != "unpaid":
+        return
+
+    pdf_bytes, profile = _invoice_pdf(session, invoice)
+    issuer = profile["business_name"] or f"{profile['firstname']} {profile['lastname']}".strip()
+    if reminder:
+        subject = f"Reminder: invoice #INV-{invoice.id} from {issuer} is overdue"
+        body = (
+            f"Hello {invoice.client_name},\n\n"
+            f"Invoice #INV-{invoice.id} for {money.format_amount(invoice.total_minor, invoice.currency)} was due on {invoice.due_date:%Y-%m-%d} "
+            f"and is still unpaid. The invoice is attached.\n\n{issuer}\n"
+        )
+    else:
+        subject = f"Invoice #INV-{invoice.id} from {issuer}"
+        body = (
+            f"Hello {invoice.client_name},\n\n"
+            f"Please find attached invoice #INV-{invoice.id} for {money.format_amount(invoice.total_minor, invoice.currency)}, "
+            f"due on {invoice.due_date:%Y-%m-%d}.\n\n{issuer}\n"
+        )
+    mail.send(mail.build_message(
+        invoice.client_email, subject, body,
+        [(f"invoice_{invoice.id}.pdf", pdf_bytes, "application/pdf")],
+    ))
+
+
+def send_invoice(session: Session, payload: dict) -> None:
+    _send_invoice_email(session, payload, reminder=False)
+
+
+def send_overdue_reminder(session: Session, payload: dict) -> None:
+    _send_invoice_email(session, payload, reminder=True)
+
+
+HANDLERS = {
+    SEND_INVOICE: send_invoice,
+    OVERDUE_REMINDER: send_overdue_reminder,
+}
+
+
+# --- Worker ---
+def run_once(worker_id: str) -> bool:
+    # Claims and runs one job; False when nothing was due
+    with Session(database.engine) as session:
+        job = claim(session, worker_id)
+        if job is None:
+            return False
+        try:
+            handler = HANDLERS.get(job.kind)
+            if handler is None:
+                raise ValueError(f"Unknown job kind '{job.kind}'")
+            handler(session, json.loads(job.payload))
+        except Exception as e:
+            logger.exception("job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+            session.rollback()
+            _finish(session, job, f"{type(e).__name__}: {e}")
+        else:
+            _finish(session, job)
+        return True
+
+
+def run_worker() -> None:
+    # Also the entry point of spawned worker processes, which start without logging set up
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    stop = threading.Event()
+    # Finish the job in hand on SIGTERM rather than leaving it to the lock timeout
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info("worker %s started", worker_id)
+    while not stop.is_set():
+        try:
+            if run_once(worker_id):
+                continue
+        except Exception:
+            logger.exception("worker %s could not claim a job", worker_id)
+        stop.wait(JOB_POLL_INTERVAL)
+
+
+# --- Scheduler ---
+def schedule_overdue_reminders(session: Session, now: datetime | None = None) -> int:
+    # Walks the (status, due_date) index in batches: one SELECT, one job
+    # executemany and one UPDATE per batch instead of a round trip per invoice
+    now = now or _utcnow()
+    remind_before = now - timedelta(days=REMINDER_INTERVAL_DAYS)
+    queued = 0
+    while True:
+        invoice_ids = session.exec(
+            select(models.Invoice.id)
+            .where(
+                models.Invoice.status == "unpaid",
+                models.Invoice.due_date < now,
+                or_(models.Invoice.reminded_at.is_(None), models.Invoice.reminded_at < remind_before),
+            )
+            .order_by(models.Invoice.due_date)
+            .limit(REMINDER_BATCH_SIZE)
+        ).all()
+        if not invoice_ids:
+            return queued
+        enqueue_many(session, OVERDUE_REMINDER, [{"invoice_id": invoice_id} for invoice_id in invoice_ids])
+        # Clients never see reminded_at, so updated_at is kept and delta syncs skip these
+        session.connection().execute(
+            update(models.Invoice)
+            .where(models.Invoice.id.in_(invoice_ids))
+            .values(reminded_at=now, updated_at=models.Invoice.updated_at)
+        )
+        session.commit()
+        queued += len(invoice_ids)
+
+
+def run_scheduler(once: bool = False) -> None:
+    # Run a single scheduler; two would race on the same overdue invoices
+    while True:
+        with Session(database.engine) as session:
+            queued = schedule_overdue_reminders(session)
+            pruned = sync.prune_tombstones(session)
+        logger.info("queued %d overdue reminders, pruned %d tombstones", queued, pruned)
+        if once:
+            return
+        threading.Event().wait(SCHEDULER_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Invoice API background jobs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="run jobs from the queue")
+    worker.add_argument("--processes", type=int, default=1)
+    scheduler = commands.add_parser("scheduler", help="queue reminders for overdue invoices and prune old tombstones")
+    scheduler.add_argument("--once", action="store_true", help="scan once and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+    if args.command == "scheduler":
+        run_scheduler(args.once)
+        return
+    if args.processes <= 1:
+        run_worker()
+        return
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, lambda signum, frame: [process.terminate() for process in processes])
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# app/mail.py
+import logging
+import os
+import pathlib
+import smtplib
+import threading
+import uuid
+from email.message import EmailMessage
+
+logger = logging.getLogger("invoice_api.mail")
+
+MAIL_BACKEND = os.getenv("MAIL_BACKEND", "console")  # smtp, file or console
+MAIL_FROM = os.getenv("MAIL_FROM", "invoices@localhost")
+MAIL_FILE_DIR = os.getenv("MAIL_FILE_DIR", "cache/mail")
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+
+def build_message(to: str, subject: str, body: str, attachments=()) -> EmailMessage:
+    # attachments: (filename, bytes, mime type) tuples
+    message = EmailMessage()
+    message["From"] = MAIL_FROM
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    for filename, data, mime_type in attachments:
+        maintype, subtype = mime_type.split("/", 1)
+        message.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+    return message
+
+
+# --- Backends ---
+class SMTPBackend:
+    # Keeps one connection per process open between messages
+    def __init__(self):
+        self._smtp = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            smtp.starttls()
+        if SMTP_USERNAME:
+            smtp.login(SMTP_USERNAME, SMTP_PASSWORD or "")
+        return smtp
+
+    def send(self, message: EmailMessage) -> None:
+        with self._lock:
+            for attempt in range(2):
+                if self._smtp is None:
+                    self._smtp = self._connect()
+                try:
+                    self._smtp.send_message(message)
+                    return
+                except smtplib.SMTPServerDisconnected:
+                    # The server dropped an idle connection; reconnect once
+                    self._smtp = None
+                    if attempt:
+                        raise
+
+
+class FileBackend:
+    # Writes every message to MAIL_FILE_DIR as an .eml file
+    def send(self, message: EmailMessage) -> None:
+        directory = pathlib.Path(MAIL_FILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"{uuid.uuid4().hex}.eml").write_bytes(message.as_bytes())
+
+
+class ConsoleBackend:
+    def send(self, message: EmailMessage) -> None:
+        attachments = [part.get_filename() for part in message.iter_attachments()]
+        logger.info("mail to %s: %s (attachments: %s)", message["To"], message["Subject"], ", ".join(attachments) or "none")
+
+
+BACKENDS = {
+    "smtp": SMTPBackend,
+    "file": FileBackend,
+    "console": ConsoleBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if MAIL_BACKEND not in BACKENDS:
+            raise RuntimeError(f"Unknown MAIL_BACKEND '{MAIL_BACKEND}', expected one of {', '.join(BACKENDS)}")
+        _backend = BACKENDS[MAIL_BACKEND]()
+    return _backend
+
+
+def send(message: EmailMessage) -> None:
+    get_backend().send(message)
@@ -1,9 +1,19 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routes import invoices, users, profiles, accounts
+from routes import invoices, users, profiles, accounts, events
+from fastapi.responses import Response
+from body_limit import BodyLimitMiddleware
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware
+import anyio
+import metrics
+import os
+import render_pool
 app = FastAPI()
 app.include_router(users.router)
+# Before invoices, whose /{invoice_id} would otherwise match /invoices/events
+app.include_router(events.router)
 app.include_router(invoices.router)
 app.include_router(profiles.router)
 app.include_router(accounts.router)
@@ -13,24 +23,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Next-Offset", "X-Next-Since", "X-Total-Count"],
 )
+# Opt-in: usually a reverse proxy compresses, but this covers direct deployments
+if os.getenv("RESPONSE_COMPRESSION", "false").lower() in ("1", "true", "yes"):
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+        brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+    )
+# Refuses oversized uploads before FastAPI spools the multipart body
+app.add_middleware(BodyLimitMiddleware, limits={"/profiles/picture": profiles.PROFILE_PICTURE_BODY_MAX_BYTES})
+# Added last so it wraps everything else and times the whole request
+app.add_middleware(MetricsMiddleware)
 from fastapi.templating import Jinja2Templates
 from fastapi import Request
 
 templates = Jinja2Templates(directory="templates")
-from fastapi.staticfiles import StaticFiles
+from static_files import CachedStaticFiles
+
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
+
+@app.on_event("shutdown")
+def shutdown_render_pool():
+    render_pool.shutdown()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return Response(
+        metrics.render(limiter.borrowed_tokens, limiter.total_tokens),
+        media_type="text/plain; version=0.0.4",
+    )
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
 @app.get("/")
 async def root():
     return {"message": "Hello, World!"}
-'''
-# Database Initialization
-from database import engine
-import models
-
-def create_db():
-    models.SQLModel.metadata.create_all(engine)
-
-create_db()
-'''
\ No newline at end of file
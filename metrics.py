@@ -0,0 +1,242 @@
+# app/metrics.py
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("invoice_api.slow")
+
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_RECORDED_STATEMENTS = 50
+# Adds X-DB-Queries to every response; for benchmarks and checks, not production
+QUERY_COUNT_HEADER = os.getenv("QUERY_COUNT_HEADER", "false").lower() in ("1", "true", "yes")
+
+
+# --- Primitives ---
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names, self.buckets = name, help, labels, buckets
+        self._values: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        for labels, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]}")
+        return lines
+
+
+def _series(name: str, help: str, kind: str, values: dict[tuple, float], labels: tuple = ()) -> list[str]:
+    # Values read from existing stats dicts at scrape time
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for label_values, value in values.items():
+        lines.append(f"{name}{_labels(labels, label_values)} {value}")
+    return lines
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency by route", ("method", "route", "status"))
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed by route", ("route",))
+DB_SECONDS = Counter("db_query_seconds_total", "Time spent in SQL statements by route", ("route",))
+SLOW_REQUESTS = Counter("http_slow_requests_total", "Requests slower than SLOW_REQUEST_SECONDS", ("route",))
+PDF_RENDER_SECONDS = Histogram("pdf_render_duration_seconds", "WeasyPrint time per rendered PDF")
+RATE_LIMIT_DECISIONS = Counter("rate_limit_decisions_total", "Rate limiter decisions by action and outcome", ("action", "outcome"))
+
+
+# --- Per-request SQL accounting ---
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _request_stats.get()
+    if stats is None:
+        return
+    # The dict is shared with threadpool workers, which run on a copy of the request context
+    stats["queries"] += 1
+    stats["db_seconds"] += elapsed
+    if len(stats["statements"]) < MAX_RECORDED_STATEMENTS:
+        stats["statements"].append((elapsed, statement))
+
+
+@contextmanager
+def count_queries():
+    # SQL statements run inside the block, including threadpool calls made from it
+    stats = {"queries": 0, "db_seconds": 0.0, "statements": []}
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    # Fails when the block runs more than `limit` statements, e.g. an N+1 creeping back in
+    with count_queries() as stats:
+        yield stats
+    if stats["queries"] > limit:
+        listing = "".join(f"\n    {' '.join(statement.split())[:200]}" for _, statement in stats["statements"])
+        raise AssertionError(f"{stats['queries']} queries, expected at most {limit}:{listing}")
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Unmatched paths share one label so typos can't blow up the series count
+    return "/static" if scope.get("path", "").startswith("/static/") else "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = {"queries": 0, "db_seconds": 0.0, "statements": []}
+        token = _request_stats.set(stats)
+        status_code = 500
+        streaming = False
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if QUERY_COUNT_HEADER:
+                    # Non-streaming responses are fully built by now, so the count is complete
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-db-queries", str(stats["queries"]).encode())]}
+                streaming = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", ())
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            route = _route_label(scope)
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route, status_code)
+            if stats["queries"]:
+                DB_QUERIES.inc(route, amount=stats["queries"])
+                DB_SECONDS.inc(route, amount=stats["db_seconds"])
+            # Event streams stay open for as long as the client wants, that isn't slowness
+            if elapsed >= SLOW_REQUEST_SECONDS and not streaming:
+                SLOW_REQUESTS.inc(route)
+                _log_slow_request(scope, route, status_code, elapsed, stats)
+
+
+def _log_slow_request(scope, route, status_code, elapsed, stats) -> None:
+    slowest = sorted(stats["statements"], reverse=True)[:5]
+    breakdown = "".join(
+        f"\n    {seconds * 1000:.1f}ms {' '.join(statement.split())[:200]}" for seconds, statement in slowest
+    )
+    logger.warning(
+        "slow request %s %s (%s) %d in %.0fms: %d queries, %.0fms in SQL%s",
+        scope["method"], scope.get("path"), route, status_code, elapsed * 1000,
+        stats["queries"], stats["db_seconds"] * 1000, breakdown,
+    )
+
+
+# --- Exposition ---
+def render(threadpool_borrowed: int, threadpool_total: int) -> str:
+    # Imported here so the instrumented modules can import metrics without a cycle
+    import auth, events, pdf_cache, render_pool
+
+    lines = []
+    for metric in (REQUEST_SECONDS, DB_QUERIES, DB_SECONDS, SLOW_REQUESTS, PDF_RENDER_SECONDS, RATE_LIMIT_DECISIONS):
+        lines += metric.render()
+
+    lines += _series("threadpool_threads_busy", "Request threadpool threads in use", "gauge", {(): threadpool_borrowed})
+    lines += _series("threadpool_threads_total", "Request threadpool size", "gauge", {(): threadpool_total})
+
+    lines += _series("pdf_render_in_flight", "PDF renders admitted (running or queued)", "gauge", {(): render_pool.stats["in_flight"]})
+    lines += _series("pdf_render_queue_depth", "PDF renders waiting for a worker", "gauge", {(): render_pool.stats["queue_depth"]})
+    lines += _series(
+        "pdf_render_total",
+        "PDF render pool outcomes",
+        "counter",
+        {(key,): render_pool.stats[key] for key in ("rendered", "failed", "rejected", "rejected_per_user")},
+        ("outcome",),
+    )
+    lines += _series("pdf_render_wait_seconds_total", "Time renders spent queued", "counter", {(): render_pool.stats["wait_seconds_total"]})
+
+    lines += _series("event_streams_open", "Open /invoices/events streams in this process", "gauge", {(): events.stats["streams"]})
+    lines += _series("events_published_total", "Invoice events published", "counter", {(): events.stats["published"]})
+    lines += _series("event_stream_resyncs_total", "Streams that fell behind and were told to resync", "counter", {(): events.stats["resyncs"]})
+
+    cache_stats = {"pdf": pdf_cache.stats, **auth.cache_stats()}
+    lines += _series(
+        "cache_lookups_total",
+        "Cache lookups by cache and outcome",
+        "counter",
+        {(name, outcome): stats.get(outcome, 0) for name, stats in cache_stats.items() for outcome in ("hits", "misses")},
+        ("cache", "outcome"),
+    )
+    lines += _series(
+        "cache_hit_ratio",
+        "Share of cache lookups that hit",
+        "gauge",
+        {(name,): stats["hits"] / ((stats["hits"] + stats["misses"]) or 1) for name, stats in cache_stats.items()},
+        ("cache",),
+    )
+    return "\n".join(lines) + "\n"
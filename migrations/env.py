@@ -0,0 +1,51 @@
+# migrations/env.py
+from logging.config import fileConfig
+from alembic import context
+import database, models
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = models.SQLModel.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The search index (and on SQLite its FTS5 shadow tables) is created in raw
+    # SQL by migration 0002 and has no model, so autogenerate would drop it
+    table_name = name if type_ == "table" else getattr(getattr(object, "table", None), "name", "")
+    return not (table_name or "").startswith("invoice_search")
+
+
+def run_migrations_offline():
+    # alembic upgrade head --sql: print the SQL instead of running it
+    context.configure(
+        url=database.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=database.IS_SQLITE,
+        include_object=include_object,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # Same engine as the app, so SQLite gets its WAL and busy_timeout pragmas
+    with database.engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can't ALTER most things in place; batch mode recreates the table
+            render_as_batch=database.IS_SQLITE,
+            include_object=include_object,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,108 @@
+"""indexes, job queue, search index and issuer snapshots
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_search_index(dialect: str) -> None:
+    # The tables search.py reads and writes, filled from the existing invoices
+    if dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE invoice_search USING fts5("
+            "owner, client_name, client_email, billing_address, extra_information, items, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "INSERT INTO invoice_search (rowid, owner, client_name, client_email, billing_address, extra_information, items) "
+            "SELECT invoice.id, 'u' || invoice.owner_id, invoice.client_name, invoice.client_email, "
+            "invoice.billing_address, coalesce(invoice.extra_information, ''), "
+            "coalesce((SELECT group_concat(title, char(10)) FROM invoiceitem WHERE invoiceitem.invoice_id = invoice.id), '') "
+            "FROM invoice"
+        )
+    elif dialect == "postgresql":
+        op.execute(
+            "CREATE TABLE invoice_search ("
+            "invoice_id INTEGER PRIMARY KEY REFERENCES invoice (id) ON DELETE CASCADE, "
+            "owner_id INTEGER NOT NULL, "
+            "document tsvector NOT NULL)"
+        )
+        op.execute("CREATE INDEX ix_invoice_search_document ON invoice_search USING GIN (document)")
+        op.execute("CREATE INDEX ix_invoice_search_owner_id ON invoice_search (owner_id)")
+        op.execute(
+            "INSERT INTO invoice_search (invoice_id, owner_id, document) "
+            "SELECT invoice.id, invoice.owner_id, "
+            "setweight(to_tsvector('simple', invoice.client_name || ' ' || invoice.client_email), 'A') || "
+            "to_tsvector('simple', invoice.billing_address || ' ' || coalesce(invoice.extra_information, '') || ' ' || "
+            "coalesce((SELECT string_agg(title, E'\\n') FROM invoiceitem WHERE invoiceitem.invoice_id = invoice.id), '')) "
+            "FROM invoice"
+        )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(
+        "SELECT user_id FROM profile GROUP BY user_id HAVING count(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"Users {duplicates} have more than one profile; keep one per user before upgrading"
+        )
+
+    # Foreign keys every per-user route filters or joins on
+    op.create_index("ix_invoice_owner_id_created_at", "invoice", ["owner_id", "created_at"])
+    op.create_index("ix_invoice_owner_id_status", "invoice", ["owner_id", "status"])
+    op.create_index("ix_invoiceitem_invoice_id", "invoiceitem", ["invoice_id"])
+    op.create_index("ix_profile_user_id", "profile", ["user_id"], unique=True)
+    op.create_index("ix_account_user_id", "account", ["user_id"])
+
+    # Overdue reminders
+    op.add_column("invoice", sa.Column("reminded_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_invoice_status_due_date", "invoice", ["status", "due_date"])
+
+    # Issuer snapshots
+    op.add_column("invoice", sa.Column("issuer_snapshot", sa.JSON(), nullable=True))
+
+    op.create_table(
+        "job",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("payload", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("run_at", sa.DateTime(), nullable=False),
+        sa.Column("locked_by", sa.String(), nullable=True),
+        sa.Column("locked_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_job_status_run_at", "job", ["status", "run_at"])
+
+    _create_search_index(bind.dialect.name)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS invoice_search")
+    op.drop_index("ix_job_status_run_at", table_name="job")
+    op.drop_table("job")
+    with op.batch_alter_table("invoice") as batch_op:
+        batch_op.drop_index("ix_invoice_status_due_date")
+        batch_op.drop_column("issuer_snapshot")
+        batch_op.drop_column("reminded_at")
+        batch_op.drop_index("ix_invoice_owner_id_status")
+        batch_op.drop_index("ix_invoice_owner_id_created_at")
+    op.drop_index("ix_account_user_id", table_name="account")
+    op.drop_index("ix_profile_user_id", table_name="profile")
+    op.drop_index("ix_invoiceitem_invoice_id", table_name="invoiceitem")
@@ -0,0 +1,58 @@
+"""money as integer minor units with a currency
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:30:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_CURRENCY = "USD"
+
+
+def upgrade() -> None:
+    op.add_column("invoice", sa.Column("currency", sa.String(), nullable=False, server_default=DEFAULT_CURRENCY))
+    op.add_column("invoice", sa.Column("total_minor", sa.BigInteger(), nullable=False, server_default="0"))
+    op.add_column("invoiceitem", sa.Column("unit_price_minor", sa.BigInteger(), nullable=False, server_default="0"))
+    op.add_column("invoiceitem", sa.Column("subtotal_minor", sa.BigInteger(), nullable=False, server_default="0"))
+
+    # The floats are rounded to the nearest hundredth as stored; POST
+    # /invoices/recompute-totals reports any that had already drifted
+    op.execute(
+        "UPDATE invoiceitem SET "
+        "unit_price_minor = CAST(ROUND(unit_price * 100) AS BIGINT), "
+        "subtotal_minor = CAST(ROUND(subtotal * 100) AS BIGINT)"
+    )
+    op.execute("UPDATE invoice SET total_minor = CAST(ROUND(total * 100) AS BIGINT)")
+
+    # On SQLite each batch recreates the table once
+    with op.batch_alter_table("invoiceitem") as batch_op:
+        batch_op.drop_column("unit_price")
+        batch_op.drop_column("subtotal")
+        batch_op.alter_column("unit_price_minor", server_default=None)
+        batch_op.alter_column("subtotal_minor", server_default=None)
+    with op.batch_alter_table("invoice") as batch_op:
+        batch_op.drop_column("total")
+        batch_op.alter_column("currency", server_default=None)
+        batch_op.alter_column("total_minor", server_default=None)
+
+
+def downgrade() -> None:
+    op.add_column("invoice", sa.Column("total", sa.Float(), nullable=False, server_default="0"))
+    op.add_column("invoiceitem", sa.Column("unit_price", sa.Float(), nullable=False, server_default="0"))
+    op.add_column("invoiceitem", sa.Column("subtotal", sa.Float(), nullable=False, server_default="0"))
+    op.execute("UPDATE invoiceitem SET unit_price = unit_price_minor / 100.0, subtotal = subtotal_minor / 100.0")
+    op.execute("UPDATE invoice SET total = total_minor / 100.0")
+    with op.batch_alter_table("invoiceitem") as batch_op:
+        batch_op.drop_column("subtotal_minor")
+        batch_op.drop_column("unit_price_minor")
+    with op.batch_alter_table("invoice") as batch_op:
+        batch_op.drop_column("total_minor")
+        batch_op.drop_column("currency")
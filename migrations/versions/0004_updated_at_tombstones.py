@@ -0,0 +1,54 @@
+"""updated_at columns and deletion tombstones for delta sync
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 11:30:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows count as changed at upgrade time, invoices as of their creation
+    for table in ("invoice", "invoiceitem", "account"):
+        op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+    op.execute("UPDATE invoice SET updated_at = created_at WHERE created_at IS NOT NULL")
+
+    # On SQLite each batch recreates the table once
+    for table in ("invoice", "invoiceitem", "account"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column("updated_at", existing_type=sa.DateTime(), nullable=False)
+    op.create_index("ix_invoice_owner_id_updated_at", "invoice", ["owner_id", "updated_at"])
+    op.create_index("ix_account_user_id_updated_at", "account", ["user_id", "updated_at"])
+
+    op.create_table(
+        "tombstone",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("record_id", sa.Integer(), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tombstone_owner_id_kind_deleted_at", "tombstone", ["owner_id", "kind", "deleted_at"])
+    op.create_index("ix_tombstone_deleted_at", "tombstone", ["deleted_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tombstone_deleted_at", table_name="tombstone")
+    op.drop_index("ix_tombstone_owner_id_kind_deleted_at", table_name="tombstone")
+    op.drop_table("tombstone")
+    op.drop_index("ix_account_user_id_updated_at", table_name="account")
+    op.drop_index("ix_invoice_owner_id_updated_at", table_name="invoice")
+    for table in ("account", "invoiceitem", "invoice"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column("updated_at")
@@ -1,7 +1,15 @@
 # app/models.py
 from typing import Optional, List
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import JSON, BigInteger, Column, Index
 from datetime import datetime, timezone
+from decimal import Decimal
+import money
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -14,29 +22,63 @@ class User(SQLModel, table=True):
 
 
 class Invoice(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_invoice_owner_id_created_at", "owner_id", "created_at"),
+        Index("ix_invoice_owner_id_status", "owner_id", "status"),
+        # Collection ETags and ?since= delta sync
+        Index("ix_invoice_owner_id_updated_at", "owner_id", "updated_at"),
+        # Overdue scan for reminders: status = 'unpaid' AND due_date < now
+        Index("ix_invoice_status_due_date", "status", "due_date"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     client_name: str
     client_email: str
     due_date: datetime
     status: str = "unpaid"
-    total: float = 0.0
+    currency: str = money.DEFAULT_CURRENCY
+    total_minor: int = Field(default=0, sa_type=BigInteger)  # hundredths, see money.py
     created_at: datetime = Field(default_factory=datetime.now(timezone.utc))
     billing_address: str  
     extra_information: Optional[str] = None  
+    reminded_at: Optional[datetime] = None  # last overdue reminder queued
+    # Profile and account as they were when the invoice was created, so the PDF never changes after the fact
+    issuer_snapshot: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    # Naive UTC, moved by every UPDATE (ORM or Core) that doesn't set it itself
+    updated_at: datetime = Field(default_factory=_utcnow, sa_column_kwargs={"onupdate": _utcnow})
 
+    # Covered by the (owner_id, ...) indexes above, which serve owner_id-only lookups too
     owner_id: int = Field(foreign_key="user.id")
     owner: Optional[User] = Relationship(back_populates="invoices")
-    items: List["InvoiceItem"] = Relationship(back_populates="invoice")
+    items: List["InvoiceItem"] = Relationship(
+        back_populates="invoice",
+        # invoiceitem.invoice_id is NOT NULL, so items go with their invoice
+        sa_relationship_kwargs={"order_by": "InvoiceItem.id", "cascade": "all, delete-orphan"},
+    )
+
+    @property
+    def total(self) -> Decimal:
+        return money.from_minor(self.total_minor)
 
 class InvoiceItem(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     quantity: int
-    unit_price: float
-    subtotal: float = 0.0
+    unit_price_minor: int = Field(sa_type=BigInteger)
+    subtotal_minor: int = Field(default=0, sa_type=BigInteger)
+    updated_at: datetime = Field(default_factory=_utcnow, sa_column_kwargs={"onupdate": _utcnow})
 
-    invoice_id: int = Field(foreign_key="invoice.id")
+    invoice_id: int = Field(foreign_key="invoice.id", index=True)
     invoice: Optional[Invoice] = Relationship(back_populates="items")
+
+    @property
+    def unit_price(self) -> Decimal:
+        return money.from_minor(self.unit_price_minor)
+
+    @property
+    def subtotal(self) -> Decimal:
+        return money.from_minor(self.subtotal_minor)
+
 class Profile(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     firstname: str
@@ -45,13 +87,51 @@ class Profile(SQLModel, table=True):
     address: Optional[str] = None
     profile_picture: Optional[str] = None  
 
-    user_id: int = Field(foreign_key="user.id")
+    user_id: int = Field(foreign_key="user.id", index=True, unique=True)  # one profile per user
     user: Optional[User] = Relationship()
 class Account(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_account_user_id_updated_at", "user_id", "updated_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     account_name: str
     account_number: str
     bank_name: str
     paypal_ID: Optional[str]  = None
-    user_id: int = Field(foreign_key="user.id")
+    updated_at: datetime = Field(default_factory=_utcnow, sa_column_kwargs={"onupdate": _utcnow})
+    user_id: int = Field(foreign_key="user.id", index=True)
     user: Optional[User] = Relationship(back_populates="accounts")
+
+
+class Job(SQLModel, table=True):
+    __table_args__ = (
+        # Workers claim the oldest due job: status = 'queued' AND run_at <= now
+        Index("ix_job_status_run_at", "status", "run_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str
+    payload: str  # JSON
+    status: str = "queued"  # queued, running, done, failed
+    attempts: int = 0
+    max_attempts: int = 5
+    run_at: datetime
+    locked_by: Optional[str] = None
+    locked_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    created_at: datetime
+
+
+class Tombstone(SQLModel, table=True):
+    # A deleted invoice or account, reported to ?since= delta syncs until pruned
+    __table_args__ = (
+        Index("ix_tombstone_owner_id_kind_deleted_at", "owner_id", "kind", "deleted_at"),
+        Index("ix_tombstone_deleted_at", "deleted_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str  # invoice or account
+    record_id: int
+    owner_id: int = Field(foreign_key="user.id")
+    deleted_at: datetime
@@ -0,0 +1,28 @@
+# app/money.py
+# Amounts are stored as integers in hundredths of the currency unit (the
+# minor unit of the two-decimal currencies invoices use) and only become
+# Decimal at the edges, so sums and comparisons in SQL and Python are exact.
+import os
+from decimal import Decimal
+
+DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "USD")
+CENT = Decimal("0.01")
+SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "NGN": "₦", "GHS": "₵", "KES": "KSh "}
+
+
+def to_minor(amount: Decimal) -> int:
+    if amount.quantize(CENT) != amount:
+        raise ValueError("Amounts can have at most two decimal places")
+    return int(amount.scaleb(2))
+
+
+def from_minor(minor: int) -> Decimal:
+    return Decimal(minor).scaleb(-2).quantize(CENT)
+
+
+def symbol(currency: str) -> str:
+    return SYMBOLS.get(currency, f"{currency} ")
+
+
+def format_amount(minor: int, currency: str) -> str:
+    return f"{symbol(currency)}{from_minor(minor):,}"
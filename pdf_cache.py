@@ -0,0 +1,153 @@
+# app/pdf_cache.py
+import hashlib
+import json
+import os
+import threading
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "cache/pdfs")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+TEMPLATE_FILES = ["templates/invoice_print.html", "static/pdf/invoice.css"]
+
+_lock = threading.Lock()
+_total_bytes = None  # lazily computed from disk on first write
+_template_version = (None, None)  # (mtimes, digest)
+
+stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+# --- Keys ---
+def template_version() -> str:
+    # Re-hash the template files only when one of them changes on disk
+    global _template_version
+    mtimes = tuple(os.path.getmtime(path) for path in TEMPLATE_FILES)
+    if _template_version[0] != mtimes:
+        digest = hashlib.sha256()
+        for path in TEMPLATE_FILES:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        _template_version = (mtimes, digest.hexdigest())
+    return _template_version[1]
+
+
+def cache_key(invoice: dict, profile: dict, account: dict | None) -> str:
+    payload = json.dumps(
+        {
+            "invoice": invoice,
+            "profile": profile,
+            "account": account,
+            "template": template_version(),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+# --- Storage ---
+def _user_dir(user_id: int) -> str:
+    return os.path.join(PDF_CACHE_DIR, str(user_id))
+
+
+def _path(user_id: int, invoice_id: int, key: str) -> str:
+    return os.path.join(_user_dir(user_id), f"{invoice_id}-{key}.pdf")
+
+
+def _remove(path: str) -> int:
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+def get(user_id: int, invoice_id: int, key: str) -> bytes | None:
+    path = _path(user_id, invoice_id, key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        stats["misses"] += 1
+        return None
+    # Touch the file so eviction treats it as recently used
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    stats["hits"] += 1
+    return data
+
+
+def put(user_id: int, invoice_id: int, key: str, data: bytes) -> None:
+    global _total_bytes
+    path = _path(user_id, invoice_id, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Drop renders of older versions of this invoice before writing the new one
+    freed = invalidate_invoice(user_id, invoice_id)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+    with _lock:
+        if _total_bytes is None:
+            _total_bytes = _scan_size()
+        else:
+            _total_bytes += len(data) - freed
+        if _total_bytes > PDF_CACHE_MAX_BYTES:
+            _evict()
+
+
+def invalidate_invoice(user_id: int, invoice_id: int) -> int:
+    directory = _user_dir(user_id)
+    if not os.path.isdir(directory):
+        return 0
+    prefix = f"{invoice_id}-"
+    freed = 0
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith(".pdf"):
+            freed += _remove(os.path.join(directory, name))
+    return freed
+
+
+# --- Eviction ---
+def _entries() -> list[tuple[float, int, str]]:
+    entries = []
+    if not os.path.isdir(PDF_CACHE_DIR):
+        return entries
+    for root, _, files in os.walk(PDF_CACHE_DIR):
+        for name in files:
+            if not name.endswith(".pdf"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def _scan_size() -> int:
+    return sum(size for _, size, _ in _entries())
+
+
+def _evict() -> None:
+    # Called with _lock held; drops least recently used renders down to 90% of the limit
+    global _total_bytes
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    target = PDF_CACHE_MAX_BYTES * 0.9
+    for _, size, path in entries:
+        if total <= target:
+            break
+        total -= _remove(path)
+        stats["evictions"] += 1
+    _total_bytes = total
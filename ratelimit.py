@@ -0,0 +1,161 @@
+# app/ratelimit.py
+# Token buckets per user, and per client IP for the unauthenticated login and
+# registration. Every request spends tokens from the buckets it is charged to
+# (a PDF render costs more than a write) and is refused with 429 + Retry-After
+# when any of them is short. Buckets live in process memory by default;
+# RATE_LIMIT_BACKEND=redis shares them between workers and hosts.
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import OAuth2PasswordRequestForm
+from auth import get_current_user
+import metrics, models
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory or redis
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", "60"))
+RATE_LIMIT_REFILL_PER_SECOND = float(os.getenv("RATE_LIMIT_REFILL_PER_SECOND", "1"))
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+
+COSTS = {
+    "pdf": float(os.getenv("RATE_LIMIT_COST_PDF", "10")),
+    "login": float(os.getenv("RATE_LIMIT_COST_LOGIN", "5")),
+    "write": float(os.getenv("RATE_LIMIT_COST_WRITE", "1")),
+    "read": float(os.getenv("RATE_LIMIT_COST_READ", "1")),
+}
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+# --- Backends ---
+class MemoryBackend:
+    # Buckets for this process only; also the stand-in for the shared backend in tests
+    def __init__(self, max_buckets: int = RATE_LIMIT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, keys: list[str], cost: float, capacity: float, rate: float) -> float:
+        # Spends cost from every bucket, or from none; returns 0 or the seconds to wait
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            for key in keys:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                levels.append(min(capacity, tokens + (now - updated) * rate))
+            wait = max((cost - tokens) / rate for tokens in levels)
+            for key, tokens in zip(keys, levels):
+                self._buckets[key] = (tokens - cost if wait <= 0 else tokens, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return max(0.0, wait)
+
+
+class RedisBackend:
+    # Same algorithm in a Lua script, so the check and the spend are atomic across workers
+    SCRIPT = """
+    local cost, capacity, rate = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local levels, wait = {}, 0
+    for i, key in ipairs(KEYS) do
+        local bucket = redis.call('HMGET', key, 'tokens', 'updated')
+        local tokens = tonumber(bucket[1]) or capacity
+        local updated = tonumber(bucket[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+        levels[i] = tokens
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+    local ttl = math.ceil(capacity / rate) + 1
+    for i, key in ipairs(KEYS) do
+        local tokens = levels[i]
+        if wait <= 0 then tokens = tokens - cost end
+        redis.call('HSET', key, 'tokens', tokens, 'updated', now)
+        redis.call('EXPIRE', key, ttl)
+    end
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL):
+        # Imported here so only deployments using it need the redis package
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def take(self, keys: list[str], cost: float, capacity: float, rate: float) -> float:
+        return max(0.0, float(self._script(keys=[f"ratelimit:{key}" for key in keys], args=[cost, capacity, rate])))
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "redis": RedisBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if RATE_LIMIT_BACKEND not in BACKENDS:
+                raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND '{RATE_LIMIT_BACKEND}', expected one of {', '.join(BACKENDS)}")
+            _backend = BACKENDS[RATE_LIMIT_BACKEND]()
+        return _backend
+
+
+# --- Checks ---
+def client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+    return request.client.host if request.client else "unknown"
+
+
+def check(action: str, keys: list[str]) -> None:
+    if not RATE_LIMIT_ENABLED:
+        return
+    try:
+        wait = get_backend().take(keys, COSTS[action], RATE_LIMIT_CAPACITY, RATE_LIMIT_REFILL_PER_SECOND)
+    except Exception:
+        # A broken shared store shouldn't take the API down with it
+        logger.exception("rate limiter unavailable, letting the request through")
+        metrics.RATE_LIMIT_DECISIONS.inc(action, "error")
+        return
+    if wait > 0:
+        metrics.RATE_LIMIT_DECISIONS.inc(action, "limited")
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded, slow down",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+    metrics.RATE_LIMIT_DECISIONS.inc(action, "allowed")
+
+
+def check_user(action: str, user_id: int) -> None:
+    # Authenticated requests only spend from the user's bucket, so accounts
+    # sharing an address (an office behind one NAT) don't throttle each other
+    check(action, [f"user:{user_id}"])
+
+
+# --- Dependencies ---
+def writes(request: Request, current_user: models.User = Depends(get_current_user)):
+    # Router-wide: charges only the methods that change something
+    if request.method in WRITE_METHODS:
+        check_user("write", current_user.id)
+
+
+def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    # Per IP, and per username so one account can't be guessed at from many addresses
+    check("login", [f"ip:login:{client_ip(request)}", f"login:{form_data.username.lower()}"])
+
+
+def register(request: Request):
+    check("login", [f"ip:login:{client_ip(request)}"])
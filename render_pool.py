@@ -0,0 +1,289 @@
+# app/render_pool.py
+import mimetypes
+import multiprocessing
+import os
+import pathlib
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator
+from fastapi import HTTPException
+import metrics
+
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_RENDER_QUEUE_SIZE = int(os.getenv("PDF_RENDER_QUEUE_SIZE", "8"))
+PDF_RENDER_PER_USER = int(os.getenv("PDF_RENDER_PER_USER", "2"))
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "60"))
+PDF_RENDER_RETRY_AFTER = int(os.getenv("PDF_RENDER_RETRY_AFTER", "2"))
+PDF_ASSET_DIR = os.getenv("PDF_ASSET_DIR", "static")
+PDF_STYLESHEET = os.getenv("PDF_STYLESHEET", "static/pdf/invoice.css")
+PDF_ASSET_CACHE_BYTES = int(os.getenv("PDF_ASSET_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+_executor = None
+_lock = threading.Lock()
+_in_flight = 0
+_per_user: dict[int, int] = {}
+
+stats = {
+    "in_flight": 0,
+    "queue_depth": 0,
+    "rejected": 0,
+    "rejected_per_user": 0,
+    "rendered": 0,
+    "failed": 0,
+    "render_seconds_total": 0.0,
+    "wait_seconds_total": 0.0,
+}
+
+
+# --- Worker side ---
+_stylesheet = None
+_font_config = None
+_assets: dict[tuple[str, int], bytes] = {}
+_assets_bytes = 0
+
+
+def _asset_base_url() -> str:
+    return pathlib.Path(PDF_ASSET_DIR).resolve().as_uri() + "/"
+
+
+def _fetch_asset(url: str) -> dict:
+    # Serves images from the local asset directory out of memory; anything
+    # else (network URLs included) is refused so a render never waits on I/O
+    global _assets_bytes
+    from weasyprint import default_url_fetcher
+
+    if url.startswith("data:"):
+        return default_url_fetcher(url)
+    base = _asset_base_url()
+    if not url.startswith(base):
+        raise ValueError(f"Refusing to fetch {url} while rendering a PDF")
+    path = pathlib.Path(urllib.request.url2pathname(urllib.parse.urlparse(url).path)).resolve()
+    if not path.is_relative_to(pathlib.Path(PDF_ASSET_DIR).resolve()):
+        raise ValueError(f"Refusing to fetch {url} outside the asset directory")
+    # Keyed on mtime as well, so a file replaced in place is read again
+    key = (url, path.stat().st_mtime_ns)
+    data = _assets.get(key)
+    if data is None:
+        data = path.read_bytes()
+        if _assets_bytes + len(data) <= PDF_ASSET_CACHE_BYTES:
+            _assets[key] = data
+            _assets_bytes += len(data)
+    mime_type, _ = mimetypes.guess_type(url)
+    return {"string": data, "mime_type": mime_type, "redirected_url": url}
+
+
+def _get_stylesheet():
+    # Parsed once per worker process and reused for every render
+    global _stylesheet, _font_config
+    if _stylesheet is None:
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+
+        _font_config = FontConfiguration()
+        _stylesheet = CSS(filename=PDF_STYLESHEET, font_config=_font_config, url_fetcher=_fetch_asset)
+    return _stylesheet, _font_config
+
+
+def _render(html: str) -> tuple[bytes, float]:
+    # Runs in a pool process, so WeasyPrint never holds the API process' GIL
+    from weasyprint import HTML
+
+    start = time.perf_counter()
+    stylesheet, font_config = _get_stylesheet()
+    pdf = HTML(string=html, base_url=_asset_base_url(), url_fetcher=_fetch_asset).write_pdf(
+        stylesheets=[stylesheet], font_config=font_config
+    )
+    return pdf, time.perf_counter() - start
+
+
+# --- Pool management ---
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor() -> None:
+    global _executor
+    with _lock:
+        broken, _executor = _executor, None
+    if broken is not None:
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _update_depth() -> None:
+    stats["in_flight"] = _in_flight
+    stats["queue_depth"] = max(0, _in_flight - PDF_RENDER_WORKERS)
+
+
+def _check_capacity(user_id: int) -> None:
+    # Called with _lock held
+    retry_after = {"Retry-After": str(PDF_RENDER_RETRY_AFTER)}
+    if _in_flight >= PDF_RENDER_WORKERS + PDF_RENDER_QUEUE_SIZE:
+        stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="PDF renderer is busy, try again shortly", headers=retry_after)
+    if _per_user.get(user_id, 0) >= PDF_RENDER_PER_USER:
+        stats["rejected_per_user"] += 1
+        raise HTTPException(status_code=429, detail="Too many PDF downloads in progress", headers=retry_after)
+
+
+def _take_slot(user_id: int) -> None:
+    # Called with _lock held, after the capacity check
+    global _in_flight
+    _in_flight += 1
+    _per_user[user_id] = _per_user.get(user_id, 0) + 1
+    _update_depth()
+
+
+def acquire_slot(user_id: int) -> None:
+    with _lock:
+        _check_capacity(user_id)
+        _take_slot(user_id)
+
+
+def try_acquire_slot(user_id: int) -> bool:
+    # Like acquire_slot, but answers False instead of raising (and counts no rejection)
+    with _lock:
+        if _in_flight >= PDF_RENDER_WORKERS + PDF_RENDER_QUEUE_SIZE or _per_user.get(user_id, 0) >= PDF_RENDER_PER_USER:
+            return False
+        _take_slot(user_id)
+        return True
+
+
+def release_slot(user_id: int) -> None:
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+        if _per_user[user_id] <= 1:
+            del _per_user[user_id]
+        else:
+            _per_user[user_id] -= 1
+        _update_depth()
+
+
+@contextmanager
+def admit(user_id: int):
+    acquire_slot(user_id)
+    try:
+        yield
+    finally:
+        release_slot(user_id)
+
+
+class Reservation:
+    # Slots taken before a streaming response starts, so a full pool is still
+    # answered with 503/429: the first one is required, the rest (up to
+    # max_slots) are taken only if free right now. Released once, by whichever
+    # of the stream's end or the response's background task gets there first.
+    def __init__(self, user_id: int, max_slots: int = 1):
+        acquire_slot(user_id)
+        self.user_id = user_id
+        self.slots = 1
+        while self.slots < max_slots and try_acquire_slot(user_id):
+            self.slots += 1
+        self._released = False
+        self._release_lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._release_lock:
+            if self._released:
+                return
+            self._released = True
+        for _ in range(self.slots):
+            release_slot(self.user_id)
+
+
+def _record(submitted: float, render_seconds: float) -> None:
+    metrics.PDF_RENDER_SECONDS.observe(render_seconds)
+    stats["rendered"] += 1
+    stats["render_seconds_total"] += render_seconds
+    stats["wait_seconds_total"] += time.perf_counter() - submitted - render_seconds
+
+
+def render_pdf(html: str, user_id: int) -> bytes:
+    # Admission is bounded, so at most workers + queue request threads ever wait here
+    with admit(user_id):
+        submitted = time.perf_counter()
+        try:
+            pdf, render_seconds = _get_executor().submit(_render, html).result(timeout=PDF_RENDER_TIMEOUT)
+        except TimeoutError:
+            stats["failed"] += 1
+            raise HTTPException(status_code=504, detail="PDF rendering timed out")
+        except BrokenProcessPool:
+            stats["failed"] += 1
+            _reset_executor()
+            raise HTTPException(status_code=500, detail="PDF renderer crashed, try again")
+        except Exception:
+            stats["failed"] += 1
+            raise
+    _record(submitted, render_seconds)
+    return pdf
+
+
+def render_local(html: str) -> bytes:
+    # For processes other than the API (the job worker), which render in-process
+    start = time.perf_counter()
+    try:
+        pdf, render_seconds = _render(html)
+    except Exception:
+        stats["failed"] += 1
+        raise
+    _record(start, render_seconds)
+    return pdf
+
+
+def render_many(jobs: Iterable[tuple[Any, str]], window: int = 1) -> Iterator[tuple[Any, bytes]]:
+    # Renders (tag, html) jobs keeping up to `window` in the pool and yields
+    # (tag, pdf) as each one completes. Callers hold one admitted slot per job
+    # in flight, so window is the number of slots in their Reservation.
+    executor = _get_executor()
+    pending = {}
+    jobs = iter(jobs)
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and len(pending) < window:
+            job = next(jobs, None)
+            if job is None:
+                exhausted = True
+                break
+            tag, html = job
+            pending[executor.submit(_render, html)] = (tag, time.perf_counter())
+        if not pending:
+            break
+        done, _ = wait(pending, timeout=PDF_RENDER_TIMEOUT, return_when=FIRST_COMPLETED)
+        if not done:
+            stats["failed"] += len(pending)
+            for future in pending:
+                future.cancel()
+            raise TimeoutError("PDF rendering timed out")
+        for future in done:
+            tag, submitted = pending.pop(future)
+            try:
+                pdf, render_seconds = future.result()
+            except BrokenProcessPool:
+                stats["failed"] += 1
+                _reset_executor()
+                raise
+            except Exception:
+                stats["failed"] += 1
+                raise
+            _record(submitted, render_seconds)
+            yield tag, pdf
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlmodel import Session, select
-import models, schemas, database
+from sqlmodel.ext.asyncio.session import AsyncSession
+import models, schemas, database, ratelimit, sync
 from auth import get_current_user
 
-router = APIRouter(prefix="/accounts", tags=["Accounts"])
+router = APIRouter(
+    prefix="/accounts",
+    tags=["Accounts"],
+    default_response_class=ORJSONResponse,
+    dependencies=[Depends(ratelimit.writes)],
+)
 
 @router.post("/", response_model=schemas.AccountRead)
 def create_account(
@@ -20,15 +28,38 @@ def create_account(
     session.refresh(db_account)
     return db_account
 
-@router.get("/", response_model=list[schemas.AccountRead])
-def get_accounts(
-    session: Session = Depends(database.get_session),
+@router.get("/", response_model=Union[list[schemas.AccountRead], schemas.AccountChanges])
+async def get_accounts(
+    request: Request,
+    response: Response,
+    since: Optional[str] = None,
+    session: AsyncSession = Depends(database.get_async_session),
     current_user: models.User = Depends(get_current_user),
 ):
-    accounts = session.exec(
-        select(models.Account).where(models.Account.user_id == current_user.id)
-    ).all()
-    return accounts
+    now = sync.utcnow()
+    owned = models.Account.user_id == current_user.id
+    changed_since = sync.parse_since(since, now) if since is not None else None
+
+    version = (await session.exec(sync.version_query(models.Account.updated_at, owned))).one()
+    headers = sync.collection_headers(sync.ACCOUNT, current_user.id, version, request, now)
+    not_modified = sync.not_modified(request, headers)
+    if not_modified is not None:
+        return not_modified
+    response.headers.update(headers)
+
+    if changed_since is not None:
+        changed = await session.exec(
+            select(models.Account)
+            .where(owned, models.Account.updated_at > changed_since)
+            .order_by(models.Account.updated_at, models.Account.id)
+        )
+        deleted = await session.exec(sync.deleted_query(sync.ACCOUNT, current_user.id, changed_since))
+        return {"changed": changed.all(), "deleted": deleted.all()}
+
+    accounts = await session.exec(
+        select(models.Account).where(owned)
+    )
+    return accounts.all()
 
 @router.delete("/{account_id}", response_model=dict)
 def delete_account(
@@ -40,5 +71,6 @@ def delete_account(
     if not account or account.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Account not found")
     session.delete(account)
+    sync.record_deletion(session, sync.ACCOUNT, current_user.id, account_id)
     session.commit()
     return {"message": "Account deleted"}
\ No newline at end of file
@@ -0,0 +1,34 @@
+# app/routers/events.py
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+import models, database, events
+from auth import get_current_user
+
+# Kept apart from the invoices router, whose dependencies only read the token from the header
+router = APIRouter(prefix="/invoices", tags=["Invoices"])
+
+
+def _stream_user(request: Request, token: Optional[str] = None) -> models.User:
+    # EventSource can't set headers, so browsers pass the token as ?token=
+    if token is None:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    # A short-lived session, so an open stream doesn't hold a pooled connection
+    with Session(database.engine) as session:
+        return get_current_user(token, session)
+
+
+@router.get("/events")
+async def invoice_events(request: Request, current_user: models.User = Depends(_stream_user)):
+    subscription = events.get_broker().subscribe(current_user.id)
+    if subscription is None:
+        raise HTTPException(status_code=429, detail="Too many open event streams")
+    return StreamingResponse(
+        events.stream(subscription, resync=request.headers.get("last-event-id") is not None),
+        media_type="text/event-stream",
+        # X-Accel-Buffering stops nginx from holding events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
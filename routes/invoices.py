@@ -1,18 +1,65 @@
 # app/routers/invoices.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
-from typing import List
-from datetime import datetime,timezone
-import models, schemas, database
+from sqlalchemy import and_, case, func, insert, or_, update
+from sqlalchemy.orm import joinedload, selectinload
+from typing import Iterator, List, Literal, Optional, Union
+from datetime import datetime,timedelta,timezone
+import base64
+import csv
+import io
+import json
+import logging
+import zipfile
+import models, schemas, database, events, invoice_pdf, jobs, money, pdf_cache, ratelimit, render_pool, search, sync
 from auth import get_current_user
-from fastapi.responses import StreamingResponse
-from fastapi.templating import Jinja2Templates
-from weasyprint import HTML
-from io import BytesIO
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from fastapi import Request
+from starlette.background import BackgroundTask
+
+logger = logging.getLogger(__name__)
+router = APIRouter(
+    prefix="/invoices",
+    tags=["Invoices"],
+    default_response_class=ORJSONResponse,
+    dependencies=[Depends(ratelimit.writes)],
+)
+
+def _invoice_rows(invoice: schemas.InvoiceCreate, owner_id: int, created_at: datetime, issuer_snapshot: dict):
+    # Column values for the invoice and its items, with subtotals and total worked out up front
+    # in integer hundredths, so the total is exact however many items there are
+    item_rows = []
+    for item in invoice.items:
+        unit_price_minor = money.to_minor(item.unit_price)
+        item_rows.append({
+            "title": item.title,
+            "quantity": item.quantity,
+            "unit_price_minor": unit_price_minor,
+            "subtotal_minor": item.quantity * unit_price_minor,
+        })
+    invoice_row = {
+        "client_name": invoice.client_name,
+        "client_email": invoice.client_email,
+        "due_date": invoice.due_date,
+        "status": "unpaid",
+        "currency": invoice.currency,
+        "total_minor": sum(row["subtotal_minor"] for row in item_rows),
+        "owner_id": owner_id,
+        "created_at": created_at,
+        "billing_address": invoice.billing_address,
+        "extra_information": invoice.extra_information,
+        "issuer_snapshot": issuer_snapshot,
+    }
+    return invoice_row, item_rows
+
+
+def _publish_invoices(owner_id: int, name: str, invoices) -> None:
+    # Pushed to the owner's open /invoices/events streams once the change is committed;
+    # invoices are Invoice objects or column dicts carrying id and total
+    for invoice in invoices:
+        header = schemas.InvoiceHeader.model_validate(invoice, from_attributes=True)
+        events.publish(owner_id, name, header.model_dump_json())
 
-router = APIRouter(prefix="/invoices", tags=["Invoices"])
-templates = Jinja2Templates(directory="templates")
 
 @router.post("/", response_model=schemas.InvoiceRead)
 def create_invoice(
@@ -20,51 +67,518 @@ def create_invoice(
     session: Session = Depends(database.get_session),
     current_user: models.User = Depends(get_current_user),
 ):
-    # Create invoice
-    new_invoice = models.Invoice(
-        client_name=invoice.client_name,
-        client_email=invoice.client_email,
-        due_date=invoice.due_date,
-        status="unpaid",
-        owner_id=current_user.id,
-        created_at=datetime.now(timezone.utc),
-        billing_address=invoice.billing_address,  
-        extra_information=invoice.extra_information 
-    )
+    issuer_snapshot = invoice_pdf.issuer_snapshot(session, current_user.id)
+    invoice_row, item_rows = _invoice_rows(invoice, current_user.id, datetime.now(timezone.utc), issuer_snapshot)
 
+    # Invoice and items go out in one transaction: flush for the id, then one executemany
+    new_invoice = models.Invoice(**invoice_row)
     session.add(new_invoice)
+    session.flush()
+    if item_rows:
+        session.connection().execute(
+            insert(models.InvoiceItem.__table__),
+            [{**row, "invoice_id": new_invoice.id} for row in item_rows],
+        )
+    search.index_invoices(session.connection(), [(new_invoice.id, invoice_row, [row["title"] for row in item_rows])])
     session.commit()
     session.refresh(new_invoice)
 
-    total = 0.0
-    for item in invoice.items:
-        subtotal = item.quantity * item.unit_price
-        total += subtotal
-        invoice_item = models.InvoiceItem(
-            title=item.title,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            subtotal=subtotal,
-            invoice_id=new_invoice.id
-        )
-        session.add(invoice_item)
+    # SQLite may reuse the id of a deleted invoice, so drop any render left under it
+    pdf_cache.invalidate_invoice(current_user.id, new_invoice.id)
+    _publish_invoices(current_user.id, events.INVOICE_CREATED, [new_invoice])
+
+    return new_invoice
+
 
-    new_invoice.total = total
+@router.post("/batch", response_model=List[schemas.InvoiceBatchResult])
+def create_invoices_batch(
+    batch: schemas.InvoiceBatchCreate,
+    session: Session = Depends(database.get_session),
+    current_user: models.User = Depends(get_current_user),
+):
+    created_at = datetime.now(timezone.utc)
+    # Every invoice in the batch shares one issuer snapshot
+    issuer_snapshot = invoice_pdf.issuer_snapshot(session, current_user.id)
+    rows = [_invoice_rows(invoice, current_user.id, created_at, issuer_snapshot) for invoice in batch.invoices]
+    invoice_table = models.Invoice.__table__
+    connection = session.connection()
+
+    # executemany with RETURNING, ids come back in the order the invoices were sent
+    invoice_ids = connection.execute(
+        insert(invoice_table).returning(invoice_table.c.id, sort_by_parameter_order=True),
+        [invoice_row for invoice_row, _ in rows],
+    ).scalars().all()
+    item_rows = [
+        {**item_row, "invoice_id": invoice_id}
+        for invoice_id, (_, items) in zip(invoice_ids, rows)
+        for item_row in items
+    ]
+    if item_rows:
+        connection.execute(insert(models.InvoiceItem.__table__), item_rows)
+    search.index_invoices(connection, [
+        (invoice_id, invoice_row, [item["title"] for item in items])
+        for invoice_id, (invoice_row, items) in zip(invoice_ids, rows)
+    ])
     session.commit()
-    session.refresh(new_invoice)
 
-    return new_invoice
+    for invoice_id in invoice_ids:
+        pdf_cache.invalidate_invoice(current_user.id, invoice_id)
+    _publish_invoices(current_user.id, events.INVOICE_CREATED, [
+        {**invoice_row, "id": invoice_id, "total": money.from_minor(invoice_row["total_minor"])}
+        for invoice_id, (invoice_row, _) in zip(invoice_ids, rows)
+    ])
+
+    return [
+        {"index": index, "id": invoice_id, "total": money.from_minor(invoice_row["total_minor"]), "item_count": len(items)}
+        for index, (invoice_id, (invoice_row, items)) in enumerate(zip(invoice_ids, rows))
+    ]
 
 
-@router.get("/", response_model=List[schemas.InvoiceRead])
+# --- Listing ---
+SORT_COLUMNS = {
+    "created_at": models.Invoice.created_at,
+    "due_date": models.Invoice.due_date,
+    "total": models.Invoice.total_minor,
+}
+
+
+def _encode_cursor(value, invoice_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, invoice_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort_field: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, invoice_id = json.loads(raw)
+        if sort_field in ("created_at", "due_date"):
+            value = datetime.fromisoformat(value)
+        return value, int(invoice_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/", response_model=Union[List[schemas.InvoiceRead], schemas.InvoiceChanges])
 def get_user_invoices(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    due_from: Optional[datetime] = None,
+    due_to: Optional[datetime] = None,
+    client_name: Optional[str] = None,
+    sort: Literal["created_at", "-created_at", "due_date", "-due_date", "total", "-total"] = "created_at",
+    include_total: bool = False,
+    since: Optional[str] = None,
+    session: Session = Depends(database.get_session),
+    current_user: models.User = Depends(get_current_user),
+):
+    now = sync.utcnow()
+    owned = models.Invoice.owner_id == current_user.id
+    changed_since = sync.parse_since(since, now) if since is not None else None
+
+    # An unchanged list is answered with a 304 before any invoice is read
+    version = session.exec(sync.version_query(models.Invoice.updated_at, owned)).one()
+    headers = sync.collection_headers(sync.INVOICE, current_user.id, version, request, now)
+    not_modified = sync.not_modified(request, headers)
+    if not_modified is not None:
+        return not_modified
+    response.headers.update(headers)
+
+    if changed_since is not None:
+        # Delta sync: everything changed or deleted after `since`, whatever the other parameters
+        changed = session.exec(
+            select(models.Invoice)
+            .where(owned, models.Invoice.updated_at > changed_since)
+            .options(selectinload(models.Invoice.items))
+            .order_by(models.Invoice.updated_at, models.Invoice.id)
+        ).all()
+        deleted = session.exec(sync.deleted_query(sync.INVOICE, current_user.id, changed_since)).all()
+        return {"changed": changed, "deleted": deleted}
+
+    filters = [owned]
+    if status:
+        filters.append(models.Invoice.status == status)
+    if due_from:
+        filters.append(models.Invoice.due_date >= due_from)
+    if due_to:
+        filters.append(models.Invoice.due_date < due_to)
+    if client_name:
+        escaped = client_name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        filters.append(models.Invoice.client_name.like(f"{escaped}%", escape="\\"))
+
+    if include_total:
+        total = session.exec(select(func.count()).select_from(models.Invoice).where(*filters)).one()
+        response.headers["X-Total-Count"] = str(total)
+
+    # Keyset pagination on (sort column, id): each page starts right after the cursor row
+    descending = sort.startswith("-")
+    sort_field = sort.lstrip("-")
+    column = SORT_COLUMNS[sort_field]
+    # Items are fetched for the whole page in one IN query rather than per invoice
+    query = select(models.Invoice).where(*filters).options(selectinload(models.Invoice.items))
+    if cursor:
+        value, last_id = _decode_cursor(cursor, sort_field)
+        if descending:
+            query = query.where(or_(column < value, and_(column == value, models.Invoice.id < last_id)))
+        else:
+            query = query.where(or_(column > value, and_(column == value, models.Invoice.id > last_id)))
+    if descending:
+        query = query.order_by(column.desc(), models.Invoice.id.desc())
+    else:
+        query = query.order_by(column, models.Invoice.id)
+
+    if limit is None:
+        return session.exec(query).all()
+
+    invoices = session.exec(query.limit(limit + 1)).all()
+    if len(invoices) > limit:
+        invoices = invoices[:limit]
+        last = invoices[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(getattr(last, column.key), last.id)
+    return invoices
+
+
+# --- Summary ---
+@router.get("/summary", response_model=schemas.InvoiceSummary)
+def get_invoice_summary(
+    session: Session = Depends(database.get_session),
+    current_user: models.User = Depends(get_current_user),
+):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+
+    paid = models.Invoice.status == "paid"
+    unpaid = models.Invoice.status == "unpaid"
+    overdue = or_(models.Invoice.status == "overdue", and_(unpaid, models.Invoice.due_date < now))
+    this_month = and_(paid, models.Invoice.due_date >= month_start, models.Invoice.due_date < next_month)
+
+    def count_if(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    def amount_if(condition):
+        return func.coalesce(func.sum(case((condition, models.Invoice.total_minor), else_=0)), 0)
+
+    # One pass over the user's invoices, every figure is a conditional aggregate
+    row = session.exec(
+        select(
+            func.count(),
+            func.coalesce(func.sum(models.Invoice.total_minor), 0),
+            count_if(paid), amount_if(paid),
+            count_if(unpaid), amount_if(unpaid),
+            count_if(overdue), amount_if(overdue),
+            amount_if(this_month),
+        ).where(models.Invoice.owner_id == current_user.id)
+    ).one()
+
+    return {
+        "total_count": row[0],
+        "total_amount": money.from_minor(row[1]),
+        "paid_count": row[2],
+        "paid_amount": money.from_minor(row[3]),
+        "unpaid_count": row[4],
+        "unpaid_amount": money.from_minor(row[5]),
+        "overdue_count": row[6],
+        "overdue_amount": money.from_minor(row[7]),
+        "paid_this_month": money.from_minor(row[8]),
+    }
+
+
+# --- Totals ---
+@router.post("/recompute-totals", response_model=schemas.TotalsReport)
+def recompute_totals(
+    apply: bool = False,
+    session: Session = Depends(database.get_session),
+    current_user: models.User = Depends(get_current_user),
+):
+    # Checks every stored subtotal and total of the user's invoices against
+    # quantity x unit price in SQL, one aggregate pass each; apply=true fixes them
+    invoice, item = models.Invoice, models.InvoiceItem
+    owned = invoice.owner_id == current_user.id
+    expected_subtotal = item.quantity * item.unit_price_minor
+    expected_total = func.coalesce(func.sum(expected_subtotal), 0)
+
+    checked = session.exec(select(func.count()).select_from(invoice).where(owned)).one()
+    item_rows = session.exec(
+        select(item.id, item.invoice_id, item.subtotal_minor, expected_subtotal)
+        .join(invoice, item.invoice_id == invoice.id)
+        .where(owned, item.subtotal_minor != expected_subtotal)
+        .order_by(item.id)
+    ).all()
+    invoice_rows = session.exec(
+        select(invoice.id, invoice.total_minor, expected_total)
+        .outerjoin(item, item.invoice_id == invoice.id)
+        .where(owned)
+        .group_by(invoice.id, invoice.total_minor)
+        .having(invoice.total_minor != expected_total)
+        .order_by(invoice.id)
+    ).all()
+
+    if apply and (item_rows or invoice_rows):
+        connection = session.connection()
+        owned_ids = select(invoice.id).where(owned)
+        connection.execute(
+            update(item)
+            .where(item.invoice_id.in_(owned_ids), item.subtotal_minor != expected_subtotal)
+            .values(subtotal_minor=expected_subtotal)
+        )
+        recomputed = (
+            select(func.coalesce(func.sum(item.subtotal_minor), 0))
+            .where(item.invoice_id == invoice.id)
+            .scalar_subquery()
+        )
+        # Invoices whose items were fixed are rewritten too, so their updated_at moves for delta sync
+        fixed_item_invoices = {row[1] for row in item_rows}
+        connection.execute(
+            update(invoice)
+            .where(owned, or_(invoice.total_minor != recomputed, invoice.id.in_(fixed_item_invoices)))
+            .values(total_minor=recomputed)
+        )
+        session.commit()
+        for invoice_id in {row[0] for row in invoice_rows} | {row[1] for row in item_rows}:
+            pdf_cache.invalidate_invoice(current_user.id, invoice_id)
+        # Totals may have moved on any number of invoices, so open lists reload
+        events.publish(current_user.id, events.RESYNC, "{}")
+
+    return {
+        "checked": checked,
+        "invoice_mismatches": [
+            {"id": invoice_id, "stored": money.from_minor(stored), "expected": money.from_minor(expected)}
+            for invoice_id, stored, expected in invoice_rows
+        ],
+        "item_mismatches": [
+            {"id": item_id, "invoice_id": invoice_id, "stored": money.from_minor(stored), "expected": money.from_minor(expected)}
+            for item_id, invoice_id, stored, expected in item_rows
+        ],
+        "applied": apply,
+    }
+
+
+# --- Search ---
+@router.get("/search", response_model=List[schemas.InvoiceRead])
+def search_invoices(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
     session: Session = Depends(database.get_session),
     current_user: models.User = Depends(get_current_user),
 ):
+    # One extra id tells whether another page exists
+    invoice_ids = search.search(session, current_user.id, q, limit + 1, offset)
+    if len(invoice_ids) > limit:
+        invoice_ids = invoice_ids[:limit]
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    if not invoice_ids:
+        return []
+
     invoices = session.exec(
-        select(models.Invoice).where(models.Invoice.owner_id == current_user.id)
+        select(models.Invoice)
+        .where(models.Invoice.id.in_(invoice_ids), models.Invoice.owner_id == current_user.id)
+        .options(selectinload(models.Invoice.items))
     ).all()
-    return invoices
+    # Back into rank order
+    by_id = {invoice.id: invoice for invoice in invoices}
+    return [by_id[invoice_id] for invoice_id in invoice_ids if invoice_id in by_id]
+
+
+# --- Export ---
+EXPORT_BATCH_SIZE = 500
+LEDGER_COLUMNS = [
+    "invoice_id", "client_name", "client_email", "billing_address", "status",
+    "due_date", "created_at", "currency", "total", "item_id", "item_title", "quantity",
+    "unit_price", "subtotal",
+]
+LEDGER_AMOUNTS = {"total", "unit_price", "subtotal"}
+
+
+class _ZipBuffer(io.RawIOBase):
+    # Write-only sink for ZipFile; the export drains it after every entry
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _export_filters(user_id: int, status: Optional[str], date_from: Optional[datetime], date_to: Optional[datetime]):
+    filters = [models.Invoice.owner_id == user_id]
+    if status:
+        filters.append(models.Invoice.status == status)
+    if date_from:
+        filters.append(models.Invoice.created_at >= date_from)
+    if date_to:
+        filters.append(models.Invoice.created_at < date_to)
+    return filters
+
+
+def _export_zip(user_id: int, filters, reservation: render_pool.Reservation) -> Iterator[bytes]:
+    # Runs after the request's session is closed, so it opens its own. Cache
+    # misses render in parallel, one per slot reserved before the response started.
+    buffer = _ZipBuffer()
+    try:
+        with Session(database.engine) as session, zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            live_issuer = None  # only looked up if some invoice predates issuer snapshots
+            # selectinload runs one items query per yield_per batch
+            result = session.exec(
+                select(models.Invoice)
+                .where(*filters)
+                .order_by(models.Invoice.id)
+                .options(selectinload(models.Invoice.items))
+                .execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            for invoices in result.partitions():
+                misses = []
+                for invoice in invoices:
+                    if invoice.issuer_snapshot:
+                        profile, account = invoice.issuer_snapshot["profile"], invoice.issuer_snapshot["account"]
+                    else:
+                        live_issuer = live_issuer or invoice_pdf.issuer_data(session, user_id)
+                        profile, account = live_issuer
+                    invoice_data = invoice_pdf.invoice_data(invoice, invoice.items)
+                    key = pdf_cache.cache_key(invoice_data, profile, account)
+                    pdf_bytes = pdf_cache.get(user_id, invoice.id, key)
+                    if pdf_bytes is None:
+                        misses.append(((invoice.id, key), invoice_pdf.render_html(invoice_data, profile, account)))
+                        continue
+                    archive.writestr(f"invoice_{invoice.id}.pdf", pdf_bytes)
+                    yield buffer.drain()
+
+                for (invoice_id, key), pdf_bytes in render_pool.render_many(misses, window=reservation.slots):
+                    pdf_cache.put(user_id, invoice_id, key, pdf_bytes)
+                    archive.writestr(f"invoice_{invoice_id}.pdf", pdf_bytes)
+                    yield buffer.drain()
+        yield buffer.drain()
+    finally:
+        reservation.release()
+
+
+def _ledger_rows(user_id: int, filters) -> Iterator:
+    with Session(database.engine) as session:
+        result = session.exec(
+            select(
+                models.Invoice.id,
+                models.Invoice.client_name,
+                models.Invoice.client_email,
+                models.Invoice.billing_address,
+                models.Invoice.status,
+                models.Invoice.due_date,
+                models.Invoice.created_at,
+                models.Invoice.currency,
+                models.Invoice.total_minor,
+                models.InvoiceItem.id,
+                models.InvoiceItem.title,
+                models.InvoiceItem.quantity,
+                models.InvoiceItem.unit_price_minor,
+                models.InvoiceItem.subtotal_minor,
+            )
+            .outerjoin(models.InvoiceItem, models.InvoiceItem.invoice_id == models.Invoice.id)
+            .where(*filters)
+            .order_by(models.Invoice.id, models.InvoiceItem.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        amounts = [index for index, name in enumerate(LEDGER_COLUMNS) if name in LEDGER_AMOUNTS]
+        for row in result:
+            row = list(row)
+            for index in amounts:
+                if row[index] is not None:
+                    row[index] = money.from_minor(row[index])
+            yield row
+
+
+def _export_csv(user_id: int, filters) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(LEDGER_COLUMNS)
+    for count, row in enumerate(_ledger_rows(user_id, filters), start=1):
+        writer.writerow(value.isoformat() if isinstance(value, datetime) else value for value in row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _export_ndjson(user_id: int, filters) -> Iterator[str]:
+    # Rows arrive ordered by invoice, so each invoice is emitted once its last item is seen
+    current = None
+    for row in _ledger_rows(user_id, filters):
+        record = dict(zip(LEDGER_COLUMNS, row))
+        if current is None or current["id"] != record["invoice_id"]:
+            if current is not None:
+                yield json.dumps(current, default=str) + "\n"
+            current = {
+                "id": record["invoice_id"],
+                "client_name": record["client_name"],
+                "client_email": record["client_email"],
+                "billing_address": record["billing_address"],
+                "status": record["status"],
+                "due_date": record["due_date"].isoformat(),
+                "created_at": record["created_at"].isoformat(),
+                "currency": record["currency"],
+                "total": float(record["total"]),
+                "items": [],
+            }
+        if record["item_id"] is not None:
+            current["items"].append({
+                "id": record["item_id"],
+                "title": record["item_title"],
+                "quantity": record["quantity"],
+                "unit_price": float(record["unit_price"]),
+                "subtotal": float(record["subtotal"]),
+            })
+    if current is not None:
+        yield json.dumps(current, default=str) + "\n"
+
+
+@router.get("/export")
+def export_invoices(
+    format: Literal["zip", "csv", "ndjson"] = "zip",
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user: models.User = Depends(get_current_user),
+):
+    filters = _export_filters(current_user.id, status, date_from, date_to)
+    filename = f"invoices_{datetime.now(timezone.utc):%Y%m%d}"
+
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(current_user.id, filters),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}.csv"},
+        )
+    if format == "ndjson":
+        return StreamingResponse(
+            _export_ndjson(current_user.id, filters),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f"attachment; filename={filename}.ndjson"},
+        )
+
+    ratelimit.check_user("pdf", current_user.id)
+    # Reserved before streaming starts, so a busy pool answers 503/429 instead of a cut-off archive;
+    # the archive renders as many PDFs at a time as it got slots, up to the per-user limit
+    reservation = render_pool.Reservation(current_user.id, max_slots=render_pool.PDF_RENDER_PER_USER)
+    return StreamingResponse(
+        _export_zip(current_user.id, filters, reservation),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}.zip"},
+        # Also frees the slot if the stream never started
+        background=BackgroundTask(reservation.release),
+    )
 
 
 @router.get("/{invoice_id}", response_model=schemas.InvoiceRead)
@@ -73,8 +587,12 @@ def get_invoice(
     session: Session = Depends(database.get_session),
     current_user: models.User = Depends(get_current_user),
 ):
-    invoice = session.get(models.Invoice, invoice_id)
-    if not invoice or invoice.owner_id != current_user.id:
+    invoice = session.exec(
+        select(models.Invoice)
+        .where(models.Invoice.id == invoice_id, models.Invoice.owner_id == current_user.id)
+        .options(selectinload(models.Invoice.items))
+    ).first()
+    if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
 
     return invoice
@@ -91,9 +609,14 @@ def delete_invoice(
         raise HTTPException(status_code=404, detail="Invoice not found")
 
     session.delete(invoice)
+    search.remove_invoice(session.connection(), invoice_id)
+    sync.record_deletion(session, sync.INVOICE, current_user.id, invoice_id)
     session.commit()
+    pdf_cache.invalidate_invoice(current_user.id, invoice_id)
+    events.publish(current_user.id, events.INVOICE_DELETED, json.dumps({"id": invoice_id}))
     return {"message": "Invoice deleted"}
 
+
 @router.get("/{invoice_id}/download")
 def download_invoice(
     invoice_id: int,
@@ -101,96 +624,65 @@ def download_invoice(
     current_user: models.User = Depends(get_current_user),
     request: Request = None
 ):
-    # Get the invoice
-    invoice = session.get(models.Invoice, invoice_id)
-    if not invoice or invoice.owner_id != current_user.id:
+    # The invoice, its items and the issuer snapshot come back in a single statement
+    invoice = session.exec(
+        select(models.Invoice)
+        .where(models.Invoice.id == invoice_id, models.Invoice.owner_id == current_user.id)
+        .options(joinedload(models.Invoice.items))
+    ).unique().first()
+    if not invoice:
         raise HTTPException(status_code=404, detail="Invoice not found")
 
-    # Get invoice items
-    items = session.exec(
-        select(models.InvoiceItem).where(models.InvoiceItem.invoice_id == invoice.id)
-    ).all()
+    invoice_data = invoice_pdf.invoice_data(invoice, invoice.items)
+    profile, account = invoice_pdf.invoice_issuer(session, invoice)
 
-    # Get user profile - explicit query to avoid relationship issues
-    user_profile = session.exec(
-        select(models.Profile).where(models.Profile.user_id == current_user.id)
-    ).first()
+    # The cache key doubles as the ETag: it changes whenever any render input does
+    key = pdf_cache.cache_key(invoice_data, profile, account)
+    headers = {"ETag": f'"{key}"', "Cache-Control": "private, no-cache"}
+    if request is not None and pdf_cache.etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        ratelimit.check_user("read", current_user.id)
+        return Response(status_code=304, headers=headers)
 
-    # Get user account (optional)
-    user_account = session.exec(
-        select(models.Account).where(models.Account.user_id == current_user.id)
-    ).first()
+    # Only an actual render costs the pdf rate; cache hits are charged like any read
+    pdf_bytes = pdf_cache.get(current_user.id, invoice.id, key)
+    if pdf_bytes is not None:
+        ratelimit.check_user("read", current_user.id)
+    else:
+        ratelimit.check_user("pdf", current_user.id)
+        try:
+            # Render the HTML template
+            html_content = invoice_pdf.render_html(invoice_data, profile, account, request)
 
-    # Prepare invoice data
-    invoice_data = {
-        "id": invoice.id,
-        "client_name": invoice.client_name,
-        "client_email": invoice.client_email,
-        "due_date": invoice.due_date,
-        "status": invoice.status,
-        "billing_address": invoice.billing_address,
-        "extra_information": invoice.extra_information,
-        "created_at": invoice.created_at,
-        "total": float(invoice.total),  # Ensure it's a float
-        "items": [
-            {
-                "title": item.title,
-                "quantity": int(item.quantity),  # Ensure it's an int
-                "unit_price": float(item.unit_price),  # Ensure it's a float
-                "subtotal": float(item.subtotal)  # Ensure it's a float
-            }
-            for item in items
-        ]
-    }
-    
-    # Prepare profile data with safe defaults
-    profile = {
-        "firstname": user_profile.firstname if user_profile else "User",
-        "lastname": user_profile.lastname if user_profile else "",
-        "business_name": user_profile.business_name if user_profile else None,
-        "address": user_profile.address if user_profile else None,
-        "profile_picture": user_profile.profile_picture if user_profile else None
-    }
+            # Generate PDF in the render pool
+            pdf_bytes = render_pool.render_pdf(html_content, current_user.id)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.exception("Error generating PDF for invoice %s", invoice.id)
+            raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
+        pdf_cache.put(current_user.id, invoice.id, key, pdf_bytes)
 
-    # Prepare account data (optional)
-    account = None
-    if user_account:
-        account = {
-            "account_name": user_account.account_name,
-            "account_number": user_account.account_number,
-            "bank_name": user_account.bank_name,
-            "paypal_ID": user_account.paypal_ID
-        }
+    headers["Content-Disposition"] = f"attachment; filename=invoice_{invoice.id}.pdf"
+    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
 
-    try:
-        # Debug: Print the data to see what's being passed
-        print(f"Invoice data: {invoice_data}")
-        print(f"Profile data: {profile}")
-        print(f"Items count: {len(invoice_data['items'])}")
-        
-        # Render the HTML template
-        html_content = templates.get_template("invoice.html").render({
-            "request": request,
-            "invoice": invoice_data,
-            "profile": profile,
-            "account": account,
-        })
 
-        # Generate PDF
-        pdf_file = BytesIO()
-        HTML(string=html_content).write_pdf(pdf_file)
-        pdf_file.seek(0)
+@router.post("/{invoice_id}/send", status_code=202)
+def send_invoice(
+    invoice_id: int,
+    session: Session = Depends(database.get_session),
+    current_user: models.User = Depends(get_current_user),
+):
+    invoice = session.get(models.Invoice, invoice_id)
+    if not invoice or invoice.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Invoice not found")
 
-        return StreamingResponse(
-            pdf_file,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=invoice_{invoice.id}.pdf"}
-        )
-        
-    except Exception as e:
-        print(f"Error generating PDF: {str(e)}")  # For debugging
-        raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
-@router.patch("/{invoice_id}/status")
+    # A worker renders the PDF and emails it to the client (python -m jobs worker)
+    job = jobs.enqueue(session, jobs.SEND_INVOICE, {"invoice_id": invoice.id})
+    session.commit()
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.patch("/{invoice_id}/status", response_model=schemas.InvoiceRead)
 def update_invoice_status(
     invoice_id: int,
     status: str,
@@ -202,5 +694,12 @@ def update_invoice_status(
         raise HTTPException(status_code=404, detail="Invoice not found")
     invoice.status = status
     session.commit()
-    session.refresh(invoice)
+    # Reloaded with its items in one IN query, for the same body GET /invoices/{id} sends
+    invoice = session.exec(
+        select(models.Invoice)
+        .where(models.Invoice.id == invoice_id)
+        .options(selectinload(models.Invoice.items))
+    ).one()
+    pdf_cache.invalidate_invoice(current_user.id, invoice.id)
+    _publish_invoices(current_user.id, events.INVOICE_UPDATED, [invoice])
     return invoice
\ No newline at end of file
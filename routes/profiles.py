@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
-import models, schemas, database
+from sqlmodel.ext.asyncio.session import AsyncSession
+import models, schemas, database, images, ratelimit
 from auth import get_current_user
-import shutil
+import hashlib
 import os
+import tempfile
 
-router = APIRouter(prefix="/profiles", tags=["Profiles"])
+router = APIRouter(prefix="/profiles", tags=["Profiles"], dependencies=[Depends(ratelimit.writes)])
 
-UPLOAD_DIR = "static/profile_pics"
+UPLOAD_DIR = images.PROFILE_PICS_DIR
+UPLOAD_CHUNK_SIZE = 64 * 1024
+PROFILE_PICTURE_MAX_BYTES = int(os.getenv("PROFILE_PICTURE_MAX_BYTES", str(5 * 1024 * 1024)))
+# Whole multipart body, enforced by BodyLimitMiddleware before the form is parsed
+PROFILE_PICTURE_BODY_MAX_BYTES = PROFILE_PICTURE_MAX_BYTES + 64 * 1024
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.post("/", response_model=schemas.ProfileRead)
@@ -21,28 +29,61 @@ def create_profile(
         user_id=current_user.id
     )
     session.add(db_profile)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        # profile.user_id is unique
+        session.rollback()
+        raise HTTPException(status_code=400, detail="Profile already exists")
     session.refresh(db_profile)
     return db_profile
 
 @router.put("/picture", response_model=schemas.ProfileRead)
-def upload_profile_picture(
+async def upload_profile_picture(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    session: Session = Depends(database.get_session),
+    session: AsyncSession = Depends(database.get_async_session),
     current_user: models.User = Depends(get_current_user),
 ):
-    profile = session.exec(
+    profile = (await session.exec(
         select(models.Profile).where(models.Profile.user_id == current_user.id)
-    ).first()
+    )).first()
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
-    filename = f"{current_user.id}_{file.filename}"
-    filepath = os.path.join(UPLOAD_DIR, filename)
-    with open(filepath, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+
+    # Oversized bodies never get here (see main.py); the file itself is still
+    # checked for type and size as it is copied to a temporary file in chunks
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    try:
+        extension = None
+        size = 0
+        digest = hashlib.sha256()
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                if extension is None:
+                    extension = images.sniff_extension(chunk)
+                    if extension is None:
+                        raise HTTPException(status_code=415, detail="Profile picture must be a PNG, JPEG, GIF or WebP image")
+                size += len(chunk)
+                if size > PROFILE_PICTURE_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail="Profile picture is too large")
+                digest.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+        if extension is None:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        # Named after the content, so the file (and its variants) can be cached as immutable
+        filename = f"{digest.hexdigest()}{extension}"
+        os.replace(tmp_path, os.path.join(UPLOAD_DIR, filename))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
     profile.profile_picture = filename
-    session.commit()
-    session.refresh(profile)
+    await session.commit()
+    await session.refresh(profile)
+
+    # Downscaled copies for PDFs and the UI are produced after the response is sent
+    background_tasks.add_task(images.make_variants, UPLOAD_DIR, filename)
     return profile
 
 @router.patch("/", response_model=schemas.ProfileRead)
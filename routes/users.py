@@ -1,47 +1,45 @@
 # app/routers/users.py
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
-import schemas, models, auth, database
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+import schemas, models, auth, database, ratelimit
+from fastapi.security import OAuth2PasswordRequestForm
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
-
 # --- Register ---
-@router.post("/register", response_model=schemas.UserRead)
-def register(user: schemas.UserCreate, session: Session = Depends(database.get_session)):
-    existing_user = session.exec(select(models.User).where(models.User.username == user.username)).first()
+@router.post("/register", response_model=schemas.UserRead, dependencies=[Depends(ratelimit.register)])
+async def register(user: schemas.UserCreate, session: AsyncSession = Depends(database.get_async_session)):
+    existing_user = (await session.exec(select(models.User).where(models.User.username == user.username))).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already taken")
 
-    hashed = auth.hash_password(user.password)
+    hashed = await auth.hash_password_async(user.password)
     db_user = models.User(username=user.username, email=user.email, hashed_password=hashed)
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()
+    await session.refresh(db_user)
     return db_user
 
 # --- Login ---
-@router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(database.get_session)):
-    user = session.exec(select(models.User).where(models.User.username == form_data.username)).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+@router.post("/login", response_model=schemas.Token, dependencies=[Depends(ratelimit.login)])
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(database.get_async_session)):
+    user = (await session.exec(select(models.User).where(models.User.username == form_data.username))).first()
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    valid, new_hash = await auth.verify_and_update_password(form_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # Transparently move the stored hash to the configured bcrypt cost
+    if new_hash:
+        user.hashed_password = new_hash
+        await session.commit()
 
-    token = auth.create_access_token({"sub": user.username})
+    token = auth.create_access_token({"sub": user.username, "uid": user.id})
     return {"access_token": token, "token_type": "bearer"}
 
 # --- Get Current User ---
 @router.get("/me", response_model=schemas.UserRead)
-def get_me(token: str = Depends(oauth2_scheme), session: Session = Depends(database.get_session)):
-    payload = auth.decode_access_token(token)
-    if payload is None:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    username = payload.get("sub")
-    user = session.exec(select(models.User).where(models.User.username == username)).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    return user
+def get_me(current_user: models.User = Depends(auth.get_current_user)):
+    return current_user
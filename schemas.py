@@ -23,16 +23,21 @@ class TokenData(BaseModel):
 
 from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel
+from decimal import Decimal
+from pydantic import BaseModel, Field, computed_field
+import images, money
 
 # --- Invoice Item ---
 class InvoiceItemCreate(BaseModel):
     title: str
     quantity: int
-    unit_price: float
+    # Exact input; amounts are stored in hundredths (see money.py)
+    unit_price: Decimal = Field(..., ge=0, max_digits=15, decimal_places=2)
 
 class InvoiceItemRead(InvoiceItemCreate):
     id: int
+    # Amounts stay JSON numbers in responses
+    unit_price: float
     subtotal: float
 
     class Config:
@@ -45,19 +50,66 @@ class InvoiceCreate(BaseModel):
     due_date: datetime
     billing_address: str 
     extra_information: Optional[str] = None
+    currency: str = Field(default_factory=lambda: money.DEFAULT_CURRENCY, pattern="^[A-Z]{3}$")
     items: List[InvoiceItemCreate]
 
-class InvoiceRead(BaseModel):
+class InvoiceBatchCreate(BaseModel):
+    invoices: List[InvoiceCreate] = Field(..., min_length=1, max_length=1000)
+
+class InvoiceBatchResult(BaseModel):
+    index: int
+    id: int
+    total: float
+    item_count: int
+
+class InvoiceHeader(BaseModel):
+    # An invoice without its items, as sent on /invoices/events
     id: int
     client_name: str
     client_email: str
     due_date: datetime
     status: str
+    currency: str
     total: float
     created_at: datetime
     billing_address: str  
     extra_information: Optional[str] = None  
+
+class InvoiceRead(InvoiceHeader):
     items: List[InvoiceItemRead]
+class InvoiceChanges(BaseModel):
+    # GET /invoices/?since=: apply deleted before changed, SQLite can reuse a deleted id
+    changed: List[InvoiceRead]
+    deleted: List[int]
+
+class InvoiceSummary(BaseModel):
+    total_count: int
+    total_amount: float
+    paid_count: int
+    paid_amount: float
+    unpaid_count: int
+    unpaid_amount: float
+    overdue_count: int
+    overdue_amount: float
+    paid_this_month: float
+
+class InvoiceTotalMismatch(BaseModel):
+    id: int
+    stored: float
+    expected: float
+
+class ItemSubtotalMismatch(BaseModel):
+    id: int
+    invoice_id: int
+    stored: float
+    expected: float
+
+class TotalsReport(BaseModel):
+    checked: int
+    invoice_mismatches: List[InvoiceTotalMismatch]
+    item_mismatches: List[ItemSubtotalMismatch]
+    applied: bool
+
 class ProfileCreate(BaseModel):
     firstname: str
     lastname: str
@@ -68,6 +120,12 @@ class ProfileRead(ProfileCreate):
     id: int
     profile_picture: Optional[str] = None
 
+    @computed_field
+    @property
+    def profile_picture_medium(self) -> Optional[str]:
+        # Generated in the background after upload, so clients fall back to profile_picture
+        return images.variant_name(self.profile_picture, "md") if self.profile_picture else None
+
     class Config:
         orm_mode = True
 
@@ -89,4 +147,8 @@ class AccountRead(AccountCreate):
     id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class AccountChanges(BaseModel):
+    changed: List[AccountRead]
+    deleted: List[int]
@@ -0,0 +1,117 @@
+# app/search.py
+# Full-text index over invoices: an FTS5 virtual table on SQLite, a tsvector
+# table with a GIN index on Postgres. Rows are keyed by invoice id and written
+# in the same transaction as the invoice, so the index never lags behind.
+# The tables are created by migrations/versions/0002_indexes_jobs_search.py.
+#
+#   python -m search rebuild      (re-indexes every invoice from the invoice tables)
+import argparse
+import re
+from sqlalchemy import text
+from sqlmodel import Session, select
+import database, models
+
+BACKEND = database.url.get_backend_name()
+INDEXED_FIELDS = ["client_name", "client_email", "billing_address", "extra_information"]
+REBUILD_BATCH_SIZE = 1000
+
+
+# --- Writes ---
+def _document(invoice_id: int, invoice_row: dict, item_titles: list[str]) -> dict:
+    document = {"id": invoice_id, "owner_id": invoice_row["owner_id"], "items": "\n".join(item_titles)}
+    for field in INDEXED_FIELDS:
+        document[field] = invoice_row.get(field) or ""
+    return document
+
+
+if BACKEND == "sqlite":
+    INSERT = text(
+        "INSERT INTO invoice_search (rowid, owner, client_name, client_email, billing_address, extra_information, items) "
+        "VALUES (:id, 'u' || :owner_id, :client_name, :client_email, :billing_address, :extra_information, :items)"
+    )
+    DELETE = text("DELETE FROM invoice_search WHERE rowid = :id")
+else:
+    # Client name and email weigh more than the address, notes and items
+    INSERT = text(
+        "INSERT INTO invoice_search (invoice_id, owner_id, document) VALUES (:id, :owner_id, "
+        "setweight(to_tsvector('simple', :client_name || ' ' || :client_email), 'A') || "
+        "to_tsvector('simple', :billing_address || ' ' || :extra_information || ' ' || :items)) "
+        "ON CONFLICT (invoice_id) DO UPDATE SET owner_id = excluded.owner_id, document = excluded.document"
+    )
+    DELETE = text("DELETE FROM invoice_search WHERE invoice_id = :id")
+
+
+def index_invoices(connection, invoices) -> None:
+    # invoices: (invoice_id, invoice_row, item_titles) tuples, written with one executemany
+    documents = [_document(invoice_id, invoice_row, titles) for invoice_id, invoice_row, titles in invoices]
+    if documents:
+        connection.execute(INSERT, documents)
+
+
+def remove_invoice(connection, invoice_id: int) -> None:
+    connection.execute(DELETE, {"id": invoice_id})
+
+
+# --- Queries ---
+def _terms(query: str) -> list[str]:
+    # Words only, so user input can never be parsed as query syntax
+    return re.findall(r"\w+", query.lower())
+
+
+def search(session: Session, owner_id: int, query: str, limit: int, offset: int) -> list[int]:
+    # Invoice ids, best match first; every term must match, the last one as a prefix
+    terms = _terms(query)
+    if not terms:
+        return []
+    params = {"owner_id": owner_id, "limit": limit, "offset": offset}
+    if BACKEND == "sqlite":
+        phrases = " AND ".join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+        params["match"] = f'owner : "u{owner_id}" AND {{client_name client_email billing_address extra_information items}} : ({phrases})'
+        statement = text(
+            "SELECT rowid FROM invoice_search WHERE invoice_search MATCH :match "
+            "ORDER BY bm25(invoice_search, 0.0, 10.0, 5.0, 2.0, 1.0, 3.0), rowid DESC "
+            "LIMIT :limit OFFSET :offset"
+        )
+    else:
+        params["tsquery"] = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+        statement = text(
+            "SELECT invoice_id FROM invoice_search, to_tsquery('simple', :tsquery) AS query "
+            "WHERE owner_id = :owner_id AND document @@ query "
+            "ORDER BY ts_rank(document, query) DESC, invoice_id DESC "
+            "LIMIT :limit OFFSET :offset"
+        )
+    return list(session.connection().execute(statement, params).scalars())
+
+
+def rebuild(session: Session) -> int:
+    connection = session.connection()
+    connection.execute(text("DELETE FROM invoice_search"))
+    indexed = 0
+    result = session.exec(
+        select(models.Invoice).order_by(models.Invoice.id).execution_options(yield_per=REBUILD_BATCH_SIZE)
+    )
+    for invoices in result.partitions():
+        titles = {}
+        for invoice_id, title in session.exec(
+            select(models.InvoiceItem.invoice_id, models.InvoiceItem.title)
+            .where(models.InvoiceItem.invoice_id.in_([invoice.id for invoice in invoices]))
+        ):
+            titles.setdefault(invoice_id, []).append(title)
+        index_invoices(connection, [
+            (invoice.id, invoice.model_dump(), titles.get(invoice.id, [])) for invoice in invoices
+        ])
+        indexed += len(invoices)
+    session.commit()
+    return indexed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Invoice search index")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    with Session(database.engine) as session:
+        print(f"indexed {rebuild(session)} invoices")
+
+
+if __name__ == "__main__":
+    main()
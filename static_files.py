@@ -0,0 +1,98 @@
+# app/static_files.py
+import gzip
+import mimetypes
+import os
+import re
+import sys
+import brotli
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from compression import accepted_encodings
+
+# Files named after a hash of their content never change, so browsers may keep them forever
+HASHED_NAME = re.compile(r"^[0-9a-f]{32,64}(_[a-z]+)?\.[a-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+COMPRESSIBLE = {".css", ".js", ".html", ".svg", ".json", ".txt", ".map"}
+# Uploads, never text assets; skipped so precompression doesn't grow with them
+SKIP_DIRS = {"profile_pics"}
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def is_content_hashed(path: str) -> bool:
+    return bool(HASHED_NAME.match(os.path.basename(path)))
+
+
+class CachedStaticFiles(StaticFiles):
+    # StaticFiles that adds Cache-Control and serves precompressed .br/.gz
+    # siblings of text assets. ETag, Last-Modified, 304s and Range requests
+    # come from Starlette's FileResponse.
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        full_path = os.fspath(full_path)
+        response = self._precompressed_response(full_path, scope, status_code)
+        if response is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+        if os.path.splitext(full_path)[1] in COMPRESSIBLE:
+            response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = IMMUTABLE if is_content_hashed(full_path) else REVALIDATE
+        return response
+
+    def _precompressed_response(self, full_path, scope, status_code):
+        if os.path.splitext(full_path)[1] not in COMPRESSIBLE:
+            return None
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in ENCODINGS:
+            compressed = full_path + suffix
+            if encoding not in accepted or not os.path.isfile(compressed):
+                continue
+            response = FileResponse(
+                compressed,
+                status_code=status_code,
+                stat_result=os.stat(compressed),
+                media_type=mimetypes.guess_type(full_path)[0],
+            )
+            response.headers["Content-Encoding"] = encoding
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+        return None
+
+
+# --- Precompression ---
+def precompress(directory: str) -> int:
+    # Writes .br and .gz next to every text asset that is missing or older than
+    # its source. A build/deploy step (python static_files.py), not run at startup;
+    # assets without a compressed sibling are simply served as they are.
+    written = 0
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [name for name in dirs if name not in SKIP_DIRS]
+        for name in files:
+            source = os.path.join(root, name)
+            if os.path.splitext(name)[1] not in COMPRESSIBLE:
+                continue
+            with open(source, "rb") as f:
+                data = None
+                for suffix, compress in ((".br", _brotli), (".gz", _gzip)):
+                    target = source + suffix
+                    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                        continue
+                    data = data if data is not None else f.read()
+                    with open(target, "wb") as out:
+                        out.write(compress(data))
+                    written += 1
+    return written
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+
+def _gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+if __name__ == "__main__":
+    print(f"wrote {precompress(sys.argv[1] if len(sys.argv) > 1 else 'static')} compressed files")
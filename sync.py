@@ -0,0 +1,86 @@
+# app/sync.py
+# Conditional GETs and ?since= delta sync for the invoice and account lists.
+# A collection's ETag hashes its row count and newest updated_at with the
+# query string, so an unchanged list costs one index-only aggregate and a 304.
+# Deletes leave a tombstone that delta syncs report until the scheduler
+# prunes it, SYNC_TOMBSTONE_DAYS later.
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+import models, pdf_cache
+
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))
+SYNC_OVERLAP_SECONDS = float(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+
+INVOICE = "invoice"
+ACCOUNT = "account"
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# --- Conditional GET ---
+def version_query(updated_at, *filters):
+    # Served from the (owner, updated_at) index without touching the rows
+    return select(func.count(), func.max(updated_at)).where(*filters)
+
+
+def collection_headers(kind: str, owner_id: int, version, request: Request, now: datetime) -> dict:
+    # Any insert or update moves max(updated_at), any delete changes the count
+    count, last_updated = version
+    digest = hashlib.sha256(f"{kind}:{owner_id}:{count}:{last_updated}:{request.url.query}".encode()).hexdigest()
+    return {
+        "ETag": f'"{digest[:32]}"',
+        "Cache-Control": "private, no-cache",
+        "X-Next-Since": next_since(now),
+    }
+
+
+def not_modified(request: Request, headers: dict) -> Response | None:
+    if pdf_cache.etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+# --- Delta sync ---
+def next_since(now: datetime) -> str:
+    # Rewound a little, so rows written by transactions still open at `now` come up next time
+    return (now - timedelta(seconds=SYNC_OVERLAP_SECONDS)).isoformat()
+
+
+def parse_since(since: str, now: datetime) -> datetime:
+    try:
+        value = datetime.fromisoformat(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since")
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    if value < now - timedelta(days=SYNC_TOMBSTONE_DAYS):
+        # Deletions from back then may already be pruned
+        raise HTTPException(status_code=410, detail="Changes that old are no longer kept, reload the full list")
+    return value
+
+
+def record_deletion(session: Session, kind: str, owner_id: int, record_id: int) -> None:
+    # Added to the caller's transaction, next to the delete itself
+    session.add(models.Tombstone(kind=kind, record_id=record_id, owner_id=owner_id, deleted_at=utcnow()))
+
+
+def deleted_query(kind: str, owner_id: int, since: datetime):
+    tombstone = models.Tombstone
+    return (
+        select(tombstone.record_id)
+        .where(tombstone.owner_id == owner_id, tombstone.kind == kind, tombstone.deleted_at > since)
+        .distinct()
+    )
+
+
+def prune_tombstones(session: Session, now: datetime | None = None) -> int:
+    cutoff = (now or utcnow()) - timedelta(days=SYNC_TOMBSTONE_DAYS)
+    result = session.connection().execute(delete(models.Tombstone).where(models.Tombstone.deleted_at < cutoff))
+    session.commit()
+    return result.rowcount